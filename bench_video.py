@@ -0,0 +1,144 @@
+"""
+Benchmark the /video-stream recognition pipeline stage by stage.
+
+Replays a directory of JPEGs (or a video file) through base64 decode,
+cv2.imdecode, face detection, alignment + ArcFace, gallery matching and the
+server's batched path (BatchScheduler → detection.process_frames), then
+reports p50/p95/p99 latency and FPS.
+
+    python bench_video.py --frames samples/ --gallery-size 5000 --resolution 1280x720
+    python bench_video.py --frames clip.mp4 --concurrency 4
+"""
+import os
+import time
+import asyncio
+import base64
+import argparse
+
+import cv2
+import numpy as np
+
+from modules.video import detection
+from modules.video.frame_codec import decode_frame
+from modules.video.frame_worker import BatchScheduler
+from modules.utils.timer import StageTimer
+
+
+def load_frames(source: str, limit: int, resolution) -> list[bytes]:
+    """Read frames from a JPEG directory or a video file, re-encoded as JPEG bytes."""
+    images = []
+    if os.path.isdir(source):
+        for f in sorted(os.listdir(source))[:limit]:
+            img = cv2.imread(os.path.join(source, f))
+            if img is not None:
+                images.append(img)
+    else:
+        cap = cv2.VideoCapture(source)
+        while len(images) < limit:
+            ok, img = cap.read()
+            if not ok:
+                break
+            images.append(img)
+        cap.release()
+    if not images:
+        raise SystemExit(f"No frames could be read from {source}")
+    if resolution:
+        images = [cv2.resize(img, resolution) for img in images]
+    return [cv2.imencode(".jpg", img)[1].tobytes() for img in images]
+
+
+def add_synthetic_users(n_users: int, per_user: int, seed: int = 0) -> None:
+    """
+    Grow the live gallery with random unit embeddings, then build the ANN
+    index over the grown gallery if it is large enough (in memory only, the
+    saved index is left alone).
+    """
+    gallery = detection.get_gallery()
+    rng = np.random.default_rng(seed)
+    for u in range(n_users):
+        gallery.add(f"bench-{u}", rng.standard_normal((per_user, gallery.dim)).astype(np.float32))
+    if len(gallery) >= gallery.ann_min_rows:
+        gallery.build_index()
+
+
+def bench_stages(jpegs: list[bytes], timer: StageTimer) -> None:
+    for jpeg in jpegs:
+        b64 = base64.b64encode(jpeg).decode()
+        with timer.stage("b64decode"):
+            raw = base64.b64decode(b64)
+        with timer.stage("imdecode"):
+            frame = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+        with timer.stage("imdecode_reduced"):
+            decode_frame(raw, target=max(detection.DET_SIZE))
+        with timer.stage("detect"):
+            face = detection._top_face(frame)
+        if face is None:
+            continue
+        with timer.stage("embed"):
+            emb = detection._embed_faces([frame], [face[1]])[0]
+        with timer.stage("match_user"):
+            detection._match_user(emb)
+
+
+def bench_full(jpegs: list[bytes], timer: StageTimer, concurrency: int) -> tuple[float, float]:
+    """
+    Replay every frame from `concurrency` streams through the server's
+    BatchScheduler + process_frames path. Returns (total FPS, mean batch size).
+    """
+    frames = [decode_frame(j, target=max(detection.DET_SIZE)) for j in jpegs]
+    sessions = [detection.new_session() for _ in range(concurrency)]
+
+    async def run():
+        scheduler = BatchScheduler(detection.process_frames)
+
+        async def stream(session):
+            for frame in frames:
+                t0 = time.perf_counter()
+                await scheduler.submit(session, frame)
+                timer.record("process_frames", time.perf_counter() - t0)
+
+        await asyncio.gather(*(stream(s) for s in sessions))
+        return scheduler.frames / max(1, scheduler.batches)
+
+    t0 = time.perf_counter()
+    mean_batch = asyncio.run(run())
+    return len(frames) * concurrency / (time.perf_counter() - t0), mean_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", required=True, help="directory of JPEGs or a video file")
+    parser.add_argument("--limit", type=int, default=200, help="max frames to replay")
+    parser.add_argument("--resolution", default="", help="resize frames to WxH before encoding")
+    parser.add_argument("--gallery-size", type=int, default=0, help="synthetic users to add")
+    parser.add_argument("--images-per-user", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1, help="parallel streams fed to the batch scheduler")
+    parser.add_argument("--warmup", type=int, default=3, help="frames to run before timing")
+    args = parser.parse_args()
+
+    resolution = tuple(int(x) for x in args.resolution.lower().split("x")) if args.resolution else None
+    jpegs = load_frames(args.frames, args.limit, resolution)
+
+    t0 = time.perf_counter()
+    detection.warmup()
+    print(f"[BENCH] Warmup (model + gallery load): {time.perf_counter() - t0:.2f}s")
+    if args.gallery_size:
+        t0 = time.perf_counter()
+        add_synthetic_users(args.gallery_size, args.images_per_user)
+        print(f"[BENCH] Synthetic users + index: {time.perf_counter() - t0:.2f}s "
+              f"(ANN index {'on' if detection.get_gallery().index_is_current() else 'off'})")
+    print(f"[BENCH] {len(jpegs)} frames, gallery rows={len(detection.get_gallery())}, "
+          f"concurrency={args.concurrency}")
+
+    bench_stages(jpegs[:args.warmup], StageTimer())
+    timer = StageTimer()
+    bench_stages(jpegs, timer)
+    fps, mean_batch = bench_full(jpegs, timer, args.concurrency)
+
+    print(timer.report())
+    print(f"[BENCH] process_frames throughput: {fps:.1f} frames/s across {args.concurrency} stream(s), "
+          f"mean batch {mean_batch:.1f}")
+
+
+if __name__ == "__main__":
+    main()
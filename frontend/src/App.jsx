@@ -51,10 +51,16 @@ export default function App() {
 
     const interval = setInterval(() => {
       if (webcamRef.current && ws.readyState === WebSocket.OPEN) {
-        const screenshot = webcamRef.current.getScreenshot();
-        if (screenshot) {
-          const base64Data = screenshot.split(",")[1];
-          ws.send(base64Data);
+        // Send raw JPEG bytes as a binary frame (no base64 overhead)
+        const canvas = webcamRef.current.getCanvas();
+        if (canvas) {
+          canvas.toBlob(
+            (blob) => {
+              if (blob && ws.readyState === WebSocket.OPEN) ws.send(blob);
+            },
+            "image/jpeg",
+            0.8
+          );
         }
       }
     }, 500);
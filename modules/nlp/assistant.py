@@ -1,10 +1,11 @@
-import requests
-import json
+from modules.nlp.llm_client import OLLAMA_MODEL, OLLAMA_URL, LLMClient, llm
 
 class Assistant:
-    def __init__(self, model="llama3.1:8b", url="http://localhost:11434/api/generate"):
+    def __init__(self, model=OLLAMA_MODEL, url=OLLAMA_URL):
         self.model = model
         self.url = url
+        # Same pooled client as the server unless pointed at another endpoint.
+        self.client = llm if url == llm.url else LLMClient(url=url, model=model)
 
     def ask_model(self, user_query: str, context: str = "") -> str:
         """
@@ -22,17 +23,8 @@ class Assistant:
         Assistant:"""
 
         try:
-            payload = {"model": self.model, "prompt": prompt}
-            response = requests.post(self.url, json=payload, stream=True, timeout=60)
-
-            reply = ""
-            for line in response.iter_lines():
-                if line:
-                    data = json.loads(line.decode("utf-8"))
-                    if "response" in data:
-                        reply += data["response"]
-                    if data.get("done", False):
-                        break
+            data = self.client.generate_sync(prompt, model=self.model)
+            reply = data.get("response") or ""
 
             return reply.strip() if reply else "I didn’t get a response."
 
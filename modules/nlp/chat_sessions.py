@@ -0,0 +1,105 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+LLM_SESSIONS = os.getenv("LLM_SESSIONS", "1") == "1"                       # reuse Ollama's context per user
+LLM_SESSION_TTL = float(os.getenv("LLM_SESSION_TTL", "600"))               # idle seconds before a session is dropped
+LLM_SESSION_MAX = int(os.getenv("LLM_SESSION_MAX", "256"))                 # sessions kept (LRU beyond that)
+LLM_SESSION_MAX_TOKENS = int(os.getenv("LLM_SESSION_MAX_TOKENS", "6144"))  # start over past this many context tokens
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "10m")                        # keep the model loaded between turns
+
+
+class ChatSession:
+    """One user's conversation as Ollama sees it: the returned `context` tokens and what it was shown."""
+
+    def __init__(self, context: list[int], shown: set[str], now: float):
+        self.context = context
+        self.shown = shown            # memory texts / turns already in the context
+        self.last_used = now
+        self.turns = 1
+
+
+class ChatSessions:
+    """
+    Per-user Ollama conversation state, so follow-up turns send only the
+    new user message plus memories the model has not seen yet and reuse the
+    already-processed prefix through `context`.
+
+    Sessions expire after `ttl` idle seconds; at most `max_sessions` are
+    kept (least recently used dropped first) and a session whose context
+    grows past `max_tokens` is dropped so the next turn starts fresh.
+    """
+
+    def __init__(self, ttl: float = LLM_SESSION_TTL, max_sessions: int = LLM_SESSION_MAX,
+                 max_tokens: int = LLM_SESSION_MAX_TOKENS, enabled: bool = LLM_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.enabled = enabled
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+        self.reused = 0
+        self.fresh = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _prune_locked(self, now: float) -> None:
+        while self._sessions:
+            user, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.ttl:
+                break
+            del self._sessions[user]
+            self.expired += 1
+
+    def get(self, user_id: str) -> ChatSession | None:
+        """The user's live session, or None if the next turn must send the full prompt."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._prune_locked(now)
+            session = self._sessions.get(user_id)
+            if session is None:
+                self.fresh += 1
+                return None
+            self.reused += 1
+            return session
+
+    def update(self, user_id: str, context: list[int] | None, shown) -> None:
+        """Record the context Ollama returned after a turn and the texts that turn showed it."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.pop(user_id, None)
+            if not context or len(context) > self.max_tokens:
+                return                    # nothing to resume from, or too long: start over next turn
+            if session is None:
+                session = ChatSession(list(context), set(shown), now)
+            else:
+                session.context = list(context)
+                session.shown.update(shown)
+                session.last_used = now
+                session.turns += 1
+            self._sessions[user_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+
+    def drop(self, user_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._prune_locked(time.monotonic())
+            return {
+                "enabled": self.enabled,
+                "active": len(self._sessions),
+                "context_tokens": sum(len(s.context) for s in self._sessions.values()),
+                "reused": self.reused,
+                "fresh": self.fresh,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
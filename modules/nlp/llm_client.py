@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+
+import httpx
+
+from modules.nlp.llm_scheduler import LLMScheduler
+logger = logging.getLogger("llm_client")
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))    # generations in flight at once (match OLLAMA_NUM_PARALLEL)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))                # seconds for a whole reply
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))                    # extra attempts on connect errors / 502-504
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))   # seconds, doubled per attempt
+
+_RETRY_STATUS = {502, 503, 504}
+
+
+class LLMError(Exception):
+    """The LLM server answered with a non-200 status."""
+
+    def __init__(self, status_code: int, detail: str = ""):
+        super().__init__(f"LLM error (HTTP {status_code}) {detail}".strip())
+        self.status_code = status_code
+
+
+class LLMClient:
+    """
+    Ollama /api/generate client over pooled keep-alive connections.
+
+    `generate` / `stream` are for async handlers (never block the event
+    loop), `generate_sync` for threaded callers such as Assistant. All of
+    them go through `scheduler`: at most `max_concurrency` in flight, the
+    rest queued by priority or rejected with QueueFull when the queue is
+    full.
+    Connect errors and 502/503/504 are retried with backoff, read
+    timeouts are not (the generation may still be running).
+    """
+
+    def __init__(self, url: str = OLLAMA_URL, model: str = OLLAMA_MODEL,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, retries: int = LLM_RETRIES):
+        self.url = url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=max_concurrency,
+                                    max_keepalive_connections=max_concurrency)
+        self._async_client = None
+        self.scheduler = LLMScheduler(max_concurrency)
+        self._sync_client = None
+        self._init_lock = threading.Lock()
+
+    def _payload(self, prompt: str, model: str | None, fields: dict) -> dict:
+        return {"model": model or self.model, "prompt": prompt, "stream": False, **fields}
+
+    @staticmethod
+    def _check(resp: httpx.Response) -> dict:
+        if resp.status_code != 200:
+            raise LLMError(resp.status_code, resp.text[:200])
+        return resp.json()
+
+    def _should_retry(self, attempt: int, error: Exception) -> bool:
+        if attempt >= self.retries:
+            return False
+        if isinstance(error, LLMError):
+            return error.status_code in _RETRY_STATUS
+        return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError))
+
+    # Async (server)
+    def _async(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(timeout=self._timeout, limits=self._limits)
+        return self._async_client
+
+    async def generate(self, prompt: str, model: str | None = None,
+                       priority: str = "interactive", **fields) -> dict:
+        """One non-streamed generation; returns Ollama's JSON (reply in "response")."""
+        client = self._async()
+        payload = self._payload(prompt, model, fields)
+        async with self.scheduler.slot(priority):
+            for attempt in range(self.retries + 1):
+                try:
+                    return self._check(await client.post(self.url, json=payload))
+                except (LLMError, httpx.TransportError) as e:
+                    if not self._should_retry(attempt, e):
+                        raise
+                    logger.warning(f"⚠️ LLM request failed ({e}); retrying")
+                    await asyncio.sleep(LLM_RETRY_BACKOFF * 2 ** attempt)
+
+    async def stream(self, prompt: str, model: str | None = None,
+                     priority: str = "interactive", **fields):
+        """
+        Streamed generation: yields Ollama's JSON chunks as they arrive
+        ({"response": token, ...}, the last one with "done": true). Retries
+        apply only until the response starts.
+        """
+        client = self._async()
+        payload = {**self._payload(prompt, model, fields), "stream": True}
+        async with self.scheduler.slot(priority):
+            for attempt in range(self.retries + 1):
+                try:
+                    async with client.stream("POST", self.url, json=payload) as resp:
+                        if resp.status_code != 200:
+                            raise LLMError(resp.status_code, (await resp.aread()).decode(errors="replace")[:200])
+                        async for line in resp.aiter_lines():
+                            if line.strip():
+                                yield json.loads(line)
+                        return
+                except (LLMError, httpx.ConnectError, httpx.ConnectTimeout) as e:
+                    if not self._should_retry(attempt, e):
+                        raise
+                    logger.warning(f"⚠️ LLM request failed ({e}); retrying")
+                    await asyncio.sleep(LLM_RETRY_BACKOFF * 2 ** attempt)
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    # Blocking (threads, CLI tools)
+    def _sync(self) -> httpx.Client:
+        if self._sync_client is None:
+            with self._init_lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(timeout=self._timeout, limits=self._limits)
+        return self._sync_client
+
+    def generate_sync(self, prompt: str, model: str | None = None,
+                      priority: str = "interactive", **fields) -> dict:
+        """Blocking form of `generate`, for code that is not running on an event loop."""
+        client = self._sync()
+        payload = self._payload(prompt, model, fields)
+        with self.scheduler.sync_slot(priority):
+            for attempt in range(self.retries + 1):
+                try:
+                    return self._check(client.post(self.url, json=payload))
+                except (LLMError, httpx.TransportError) as e:
+                    if not self._should_retry(attempt, e):
+                        raise
+                    logger.warning(f"⚠️ LLM request failed ({e}); retrying")
+                    time.sleep(LLM_RETRY_BACKOFF * 2 ** attempt)
+
+    def close(self) -> None:
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+
+# Shared by server.py and Assistant, so they reuse one connection pool.
+llm = LLMClient()
@@ -0,0 +1,220 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "16"))      # waiting requests before new ones get 429
+LLM_MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", "30"))      # seconds a request may wait for a slot
+
+# Lower value = served first.
+PRIORITIES = {"interactive": 0, "background": 1}
+
+
+class QueueFull(Exception):
+    """No LLM slot now or soon; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    """A queued request, woken from any thread with the slot (True) or an error."""
+
+    def __init__(self, loop=None):
+        self.state = None                 # None = waiting, True = granted, else the exception
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def wake(self, state) -> None:
+        self.state = state
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done():        # gone if the waiter timed out meanwhile
+            self.future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Admission control in front of the LLM backend.
+
+    At most `max_concurrency` requests run at once (match it to what the
+    backend runs in parallel, e.g. OLLAMA_NUM_PARALLEL). Others wait in a
+    priority queue of at most `max_queue` entries, interactive before
+    background, FIFO within a class. When the queue is full a new request
+    is rejected with QueueFull, unless it outranks a queued one, which is
+    then rejected instead. Nobody waits longer than `max_wait`.
+
+    `slot` is for coroutines, `sync_slot` for threads; both share the same
+    slots and queue.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int = LLM_MAX_QUEUE,
+                 max_wait: float = LLM_MAX_WAIT):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = []                # heap of (priority, seq, ticket)
+        self._seq = itertools.count()
+        self._service = None              # EWMA of seconds a slot is held
+        self._waits = deque(maxlen=1000)  # recent queue waits, seconds
+        self.admitted = 0
+        self.rejected = 0
+        self.shed = 0                     # queued requests pushed out by higher-priority ones
+        self.timed_out = 0
+
+    def _retry_after(self) -> int:
+        per_slot = self._service if self._service is not None else 5.0
+        return max(1, math.ceil((len(self._waiters) + 1) / self.max_concurrency * per_slot))
+
+    def retry_after(self) -> int:
+        """Rough seconds until a new request would get a slot."""
+        with self._lock:
+            return self._retry_after()
+
+    def _admissible(self, prio: int) -> bool:
+        if self._active < self.max_concurrency and not self._waiters:
+            return True
+        if len(self._waiters) < self.max_queue:
+            return True
+        return bool(self._waiters) and max(self._waiters)[0] > prio
+
+    def check(self, priority: str = "interactive") -> None:
+        """Raise QueueFull now if a request of this class would be turned away."""
+        with self._lock:
+            if not self._admissible(PRIORITIES[priority]):
+                self.rejected += 1
+                raise QueueFull(self._retry_after())
+
+    def _enter(self, priority: str, loop=None):
+        """Take a free slot (returns None) or queue a ticket for one."""
+        prio = PRIORITIES[priority]
+        with self._lock:
+            if self._active < self.max_concurrency and not self._waiters:
+                self._active += 1
+                self.admitted += 1
+                self._waits.append(0.0)
+                return None
+            if len(self._waiters) >= self.max_queue:
+                worst = max(self._waiters, default=None)
+                if worst is None or worst[0] <= prio:
+                    self.rejected += 1
+                    raise QueueFull(self._retry_after())
+                self._discard(worst)
+                worst[2].wake(QueueFull(self._retry_after()))
+                self.shed += 1
+            entry = (prio, next(self._seq), _Ticket(loop))
+            heapq.heappush(self._waiters, entry)
+            return entry
+
+    def _leave(self, entry, t0: float, timed_out: bool) -> None:
+        """After waiting: raise unless the ticket was granted; a timeout keeps a late grant."""
+        ticket = entry[2]
+        with self._lock:
+            if ticket.state is None:
+                self._discard(entry)
+                if timed_out:
+                    self.timed_out += 1
+                    raise QueueFull(self._retry_after())
+            if ticket.state is True:
+                self.admitted += 1
+                self._waits.append(time.monotonic() - t0)
+                return
+        raise ticket.state
+
+    async def acquire(self, priority: str = "interactive") -> None:
+        entry = self._enter(priority, asyncio.get_running_loop())
+        if entry is None:
+            return
+        t0 = time.monotonic()
+        try:
+            await asyncio.wait_for(entry[2].future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._leave(entry, t0, timed_out=True)
+        except BaseException:
+            with self._lock:
+                self._discard(entry)
+                granted = entry[2].state is True
+            if granted:
+                self.release()            # the slot was handed over as we were cancelled
+            raise
+        else:
+            self._leave(entry, t0, timed_out=False)
+
+    def acquire_sync(self, priority: str = "interactive") -> None:
+        """Blocking `acquire` for threads."""
+        entry = self._enter(priority)
+        if entry is None:
+            return
+        t0 = time.monotonic()
+        woken = entry[2].event.wait(self.max_wait)
+        self._leave(entry, t0, timed_out=not woken)
+
+    def _discard(self, entry) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def release(self, held: float | None = None) -> None:
+        """Hand the slot to the best waiter, or free it."""
+        with self._lock:
+            if held is not None:
+                self._service = held if self._service is None else 0.8 * self._service + 0.2 * held
+            while self._waiters:
+                _, _, ticket = heapq.heappop(self._waiters)
+                if ticket.state is None:
+                    ticket.wake(True)
+                    return
+            self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive"):
+        await self.acquire(priority)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - t0)
+
+    @contextmanager
+    def sync_slot(self, priority: str = "interactive"):
+        self.acquire_sync(priority)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - t0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            depth = {name: sum(1 for p, _, _ in self._waiters if p == prio) for name, prio in PRIORITIES.items()}
+            queued = len(self._waiters)
+            active = self._active
+        pct = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else 0.0
+        return {
+            "active": active,
+            "max_concurrency": self.max_concurrency,
+            "queued": queued,
+            "queued_by_priority": depth,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "wait_p50_ms": pct(0.50),
+            "wait_p95_ms": pct(0.95),
+            "avg_service_s": None if self._service is None else round(self._service, 2),
+        }
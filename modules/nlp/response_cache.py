@@ -0,0 +1,116 @@
+import os
+import time
+import hashlib
+import itertools
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "0") == "1"                         # off unless enabled
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))  # cosine of query embeddings
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))               # seconds
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))               # entries across all users
+
+
+def context_facts(matches, top_k: int, threshold: float = RESPONSE_CACHE_THRESHOLD) -> list[dict]:
+    """
+    The `top_k` best retrieved memories that carry facts. Bot replies and
+    memories that are just paraphrases of the question (score >= threshold,
+    e.g. the question itself, asked earlier) are skipped: they change every
+    time the question is asked but add nothing to answer it from. Retrieve
+    a few more than `top_k` so they can be skipped without losing facts.
+    """
+    facts = [
+        m for m in matches
+        if (m["metadata"] or {}).get("role") != "bot" and m["score"] < threshold
+    ]
+    return sorted(facts, key=lambda m: m["score"], reverse=True)[:top_k]
+
+
+def context_fingerprint(facts) -> str:
+    """Hash of the memories an answer was based on (see context_facts)."""
+    ids = sorted(m["id"] for m in facts)
+    return hashlib.sha256("\0".join(ids).encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Semantic cache of LLM replies, scoped to (user, context fingerprint).
+
+    A query whose embedding has cosine >= `threshold` with a cached one of
+    the same user and the same retrieved context gets the cached reply.
+    Entries expire after `ttl` seconds; beyond `max_entries` the least
+    recently used go first. enabled=False turns every call into a no-op.
+    """
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()     # entry id -> (scope, vector, reply, expires_at)
+        self._scopes = {}                 # (user, fingerprint) -> set of entry ids
+        self._ids = itertools.count()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop_locked(self, eid) -> None:
+        scope = self._entries.pop(eid)[0]
+        ids = self._scopes[scope]
+        ids.discard(eid)
+        if not ids:
+            del self._scopes[scope]
+
+    def get(self, user_id: str, fingerprint: str, vector) -> dict | None:
+        """{"reply", "similarity"} of the closest cached answer above threshold, else None."""
+        if not self.enabled:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        now = time.monotonic()
+        with self._lock:
+            best, best_sim = None, self.threshold
+            for eid in list(self._scopes.get((user_id, fingerprint), ())):
+                _, vec, _, expires = self._entries[eid]
+                if expires < now:
+                    self._drop_locked(eid)
+                    continue
+                sim = float(vec @ vector)          # unit vectors
+                if sim >= best_sim:
+                    best, best_sim = eid, sim
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return {"reply": self._entries[best][2], "similarity": best_sim}
+
+    def put(self, user_id: str, fingerprint: str, vector, reply: str) -> None:
+        if not self.enabled or self.max_entries <= 0:
+            return
+        scope = (user_id, fingerprint)
+        with self._lock:
+            eid = next(self._ids)
+            vec = np.asarray(vector, dtype=np.float32)
+            self._entries[eid] = (scope, vec, reply, time.monotonic() + self.ttl)
+            self._scopes.setdefault(scope, set()).add(eid)
+            while len(self._entries) > self.max_entries:
+                self._drop_locked(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,96 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger("embedding_batcher")
+
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))
+
+
+class EmbeddingBatcher:
+    """
+    Gathers embedding requests from concurrent callers and runs one
+    `encode(list_of_texts) -> (N, D) array` per batch on a worker thread.
+
+    A batch closes after `window_ms` from its first request or at
+    `max_batch` texts, whichever comes first. Each caller gets its own
+    vector back through a Future. window_ms <= 0 disables batching.
+    """
+
+    def __init__(self, encode, window_ms: float = EMBED_BATCH_WINDOW_MS,
+                 max_batch: int = EMBED_BATCH_MAX):
+        self._encode = encode
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        fut = Future()
+        if self.window <= 0:
+            try:
+                fut.set_result(np.asarray(self._encode([text]))[0])
+            except Exception as e:
+                fut.set_exception(e)
+            return fut
+        self._ensure_worker()
+        self._queue.put((text, fut))
+        return fut
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Drop-in for `model.encode(list)`: each text joins whatever batch is open."""
+        if len(texts) >= self.max_batch:
+            return np.asarray(self._encode(texts))    # already a full batch
+        futures = [self.submit(t) for t in texts]
+        return np.stack([f.result() for f in futures])
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            try:
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                pass
+            self._flush(batch)
+
+    def _flush(self, batch) -> None:
+        texts = [t for t, _ in batch]
+        self.batches += 1
+        self.texts += len(texts)
+        try:
+            vectors = np.asarray(self._encode(texts))
+        except Exception as e:
+            logger.error(f"❌ Batched encode of {len(texts)} texts failed: {e}")
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        for (_, fut), vec in zip(batch, vectors):
+            fut.set_result(vec)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": self.texts / self.batches if self.batches else 0.0,
+        }
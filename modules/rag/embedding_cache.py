@@ -0,0 +1,163 @@
+import os
+import atexit
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+logger = logging.getLogger("embedding_cache")
+
+EMBED_CACHE_BYTES = int(os.getenv("EMBED_CACHE_BYTES", str(32 * 1024 * 1024)))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")   # e.g. data/embed_cache.npz; empty = memory only
+
+
+def normalize_text(text: str) -> str:
+    """Cache key form of a text: collapsed whitespace, case-folded (MiniLM is uncased)."""
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of text embeddings keyed by (model name, normalized text).
+
+    Size is capped by `max_bytes` (vector bytes + key bytes). With `path` set,
+    entries are loaded at startup and saved back at exit as a single .npz.
+    """
+
+    def __init__(self, max_bytes: int = EMBED_CACHE_BYTES, path: str = ""):
+        self.max_bytes = max_bytes
+        self.path = path
+        self._entries = OrderedDict()     # key -> np.ndarray
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            self.load()
+
+    @staticmethod
+    def _key(model_name: str, text: str) -> str:
+        return f"{model_name}\0{normalize_text(text)}"
+
+    @staticmethod
+    def _cost(key: str, vec: np.ndarray) -> int:
+        return vec.nbytes + len(key)
+
+    def _put_locked(self, key: str, vec: np.ndarray) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= self._cost(key, old)
+        cost = self._cost(key, vec)
+        if cost > self.max_bytes:
+            return
+        self._entries[key] = vec
+        self._bytes += cost
+        while self._bytes > self.max_bytes:
+            k, v = self._entries.popitem(last=False)
+            self._bytes -= self._cost(k, v)
+            self.evictions += 1
+
+    def get_many(self, texts: list[str], model_name: str, compute) -> list[np.ndarray]:
+        """
+        Embeddings for `texts`, computing only the misses with a single
+        `compute(list_of_texts) -> (N, D) array` call.
+        """
+        keys = [self._key(model_name, t) for t in texts]
+        out = [None] * len(texts)
+        missing = {}                      # key -> first index needing it
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._entries.get(key)
+                if vec is not None:
+                    self._entries.move_to_end(key)
+                    out[i] = vec
+                    self.hits += 1
+                elif key not in missing:
+                    missing[key] = i
+                    self.misses += 1
+                else:
+                    self.hits += 1        # duplicate within the same batch
+
+        if missing:
+            vecs = compute([texts[i] for i in missing.values()])
+            fresh = {}
+            with self._lock:
+                for key, vec in zip(missing, vecs):
+                    vec = np.asarray(vec, dtype=np.float32)
+                    vec.flags.writeable = False
+                    self._put_locked(key, vec)
+                    fresh[key] = vec
+            for i, key in enumerate(keys):
+                if out[i] is None:
+                    out[i] = fresh[key]
+        return out
+
+    def get(self, text: str, model_name: str, compute) -> np.ndarray:
+        return self.get_many([text], model_name, compute)[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # Persistence
+    def save(self, path: str | None = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            items = list(self._entries.items())
+        if not items:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        by_dim = {}
+        for key, vec in items:
+            by_dim.setdefault(vec.shape[0], []).append((key, vec))
+        arrays = {}
+        for dim, group in by_dim.items():
+            arrays[f"keys_{dim}"] = np.array([k for k, _ in group])
+            arrays[f"vectors_{dim}"] = np.stack([v for _, v in group])
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+        logger.info(f"💾 Saved {len(items)} cached embeddings to {path}")
+
+    def load(self, path: str | None = None) -> None:
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as data:
+                with self._lock:
+                    for name in data.files:
+                        if not name.startswith("keys_"):
+                            continue
+                        vectors = data["vectors_" + name[len("keys_"):]]
+                        for key, vec in zip(data[name], vectors):
+                            vec = np.array(vec, dtype=np.float32)
+                            vec.flags.writeable = False
+                            self._put_locked(str(key), vec)
+            logger.info(f"📂 Loaded {len(self._entries)} cached embeddings from {path}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"❌ Could not load embedding cache {path}: {e}")
+
+
+# Shared by rag_utils and modules.rag.embeddings.
+default_cache = EmbeddingCache(path=EMBED_CACHE_PATH)
+if EMBED_CACHE_PATH:
+    atexit.register(default_cache.save)
@@ -1,30 +1,66 @@
 from __future__ import annotations
+import os
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"  # 384-dim
-_INDEX_DIM = 512                                        # your Pinecone index dim
+from modules.rag.embedding_cache import default_cache
+from modules.rag.embedding_batcher import EmbeddingBatcher
+from modules.rag import onnx_embedder
+from modules.utils.registry import components
 
-_model = SentenceTransformer(_MODEL_NAME)
+# One embedding format for the whole app: the model's native dimension,
+# unit-length float32 arrays. Quantize for storage with modules.rag.quantization.
+MODEL_NAME = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")  # 384-dim
+EMBED_DIM = int(os.getenv("EMBED_DIM", "384"))  # must match EMBED_MODEL; lets stores open before the model loads
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")  # torch (SentenceTransformer) | onnx (see onnx_embedder.py)
 
-def _pad_to_index_dim(vec: np.ndarray) -> np.ndarray:
-    """Zero-pad (or truncate) a 1D vector to _INDEX_DIM."""
-    d = vec.shape[0]
-    if d == _INDEX_DIM:
-        return vec
-    if d > _INDEX_DIM:
-        return vec[:_INDEX_DIM]
-    out = np.zeros(_INDEX_DIM, dtype=np.float32)
-    out[:d] = vec
-    return out
+# Cache entries are keyed by this, so vectors from different backends/graphs never mix.
+CACHE_KEY = MODEL_NAME if EMBED_BACKEND == "torch" else f"{MODEL_NAME}@onnx:{onnx_embedder.EMBED_ONNX_FILE}"
+
+def _load_model():
+    if EMBED_BACKEND == "onnx":
+        model = onnx_embedder.OnnxEmbedder()
+    elif EMBED_BACKEND == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(MODEL_NAME)
+    else:
+        raise ValueError(f"Unknown EMBED_BACKEND: {EMBED_BACKEND!r}")
+    if model.get_sentence_embedding_dimension() != EMBED_DIM:
+        raise ValueError(f"{MODEL_NAME} is {model.get_sentence_embedding_dimension()}-dim; "
+                         f"set EMBED_DIM to match")
+    return model
+
+# Loaded on the first encode (or by components.warmup()), not at import.
+components.register("embedding_model", _load_model)
+DIM = EMBED_DIM
+
+def encode(texts: list[str]) -> np.ndarray:
+    """Raw model call → (N, DIM) float32, L2-normalized."""
+    model = components.get("embedding_model")
+    return np.asarray(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+# Concurrent callers share one encode() call per short window.
+batcher = EmbeddingBatcher(encode)
+
+def embed_arrays(texts: list[str], cache: bool = True) -> np.ndarray:
+    """
+    Batch embed → (N, DIM) float32 array (cache hits skip the model).
+    cache=False calls the model directly, for bulk jobs that would only churn the cache.
+    """
+    if not texts:
+        return np.zeros((0, DIM), dtype=np.float32)
+    if not cache:
+        return encode(texts)
+    return np.stack(default_cache.get_many(texts, CACHE_KEY, batcher.encode))
+
+def embed_array(text: str) -> np.ndarray:
+    """Embed a single string → (DIM,) float32 array."""
+    return default_cache.get(text, CACHE_KEY, batcher.encode)
 
 def embed_text(text: str) -> list[float]:
-    """Embed a single string → 512-dim (list of floats)."""
-    v = _model.encode([text], normalize_embeddings=True)[0]  # shape (384,)
-    v512 = _pad_to_index_dim(np.asarray(v, dtype=np.float32))
-    return v512.tolist()
-
-def embed_texts(texts: list[str]) -> list[list[float]]:
-    """Batch embed → list of 512-dim vectors."""
-    vs = _model.encode(texts, normalize_embeddings=True)     # (N, 384)
-    return [_pad_to_index_dim(np.asarray(v, dtype=np.float32)).tolist() for v in vs]
+    """Embed a single string → list of floats (for JSON APIs such as Pinecone)."""
+    return embed_array(text).tolist()
+
+def embed_texts(texts: list[str], cache: bool = True) -> list[list[float]]:
+    """Batch embed → list of float lists."""
+    return embed_arrays(texts, cache=cache).tolist()
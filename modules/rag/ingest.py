@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))      # chunks per embed + upsert
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))              # concurrent upserts
+CHUNK_CHARS = int(os.getenv("INGEST_CHUNK_CHARS", "1000"))
+CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "100"))
+
+
+# Readers: each yields (offset_after, doc_id, text, metadata). offset_after is
+# the byte offset in the file once that document has been read, so a
+# checkpointed offset is a safe place to resume from.
+def _read_lines(path: str, start: int, parse):
+    name = os.path.basename(path)
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        for raw in f:
+            line_start, offset = offset, offset + len(raw)
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            doc = parse(line)
+            if doc is None:
+                continue
+            text, meta, doc_id = doc
+            yield offset, doc_id or f"{name}:{line_start}", text, meta
+
+
+def _parse_jsonl(line: str, text_field: str):
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return None
+    text = rec.get(text_field) if isinstance(rec, dict) else None
+    if not text:
+        return None
+    meta = {k: v for k, v in rec.items()
+            if k not in (text_field, "id") and isinstance(v, (str, int, float, bool))}
+    return str(text), meta, rec.get("id")
+
+
+def iter_documents(path: str, start: int = 0, text_field: str = "text"):
+    """.jsonl: one object per line ({"text", optional "id", scalar fields kept as metadata});
+    .txt: one document per line; .md: the whole file is one document."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        yield from _read_lines(path, start, lambda line: _parse_jsonl(line, text_field))
+    elif ext == ".txt":
+        yield from _read_lines(path, start, lambda line: (line, {}, None))
+    elif ext in (".md", ".markdown"):
+        size = os.path.getsize(path)
+        if start < size:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield size, os.path.basename(path), f.read(), {}
+    else:
+        raise ValueError(f"Unsupported input {path} (expected .jsonl, .txt or .md)")
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Split into ~max_chars pieces at paragraph / sentence / word boundaries, with overlap."""
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            for sep in ("\n\n", ". ", "\n", " "):
+                cut = text.rfind(sep, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class Checkpoint:
+    """
+    {abs path: byte offset fully ingested} in a JSON file, rewritten
+    atomically. Batches finish out of order, so an offset is only recorded
+    once every batch before it has been written too.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.offsets = json.load(f).get("files", {})
+        self._lock = threading.Lock()
+        self._next = 0                # next batch sequence number to commit
+        self._done = {}               # seq -> [(file, offset), ...] finished but not yet committed
+
+    def start(self, file: str) -> int:
+        return self.offsets.get(os.path.abspath(file), 0)
+
+    def complete(self, seq: int, marks) -> None:
+        with self._lock:
+            self._done[seq] = marks
+            advanced = False
+            while self._next in self._done:
+                for file, offset in self._done.pop(self._next):
+                    self.offsets[os.path.abspath(file)] = offset
+                self._next += 1
+                advanced = True
+            if advanced:
+                self._save()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"files": self.offsets}, f)
+        os.replace(tmp, self.path)
+
+
+def _retry(fn, attempts: int = 3, delay: float = 1.0):
+    for i in range(attempts):
+        try:
+            return fn()
+        except Exception:
+            if i == attempts - 1:
+                raise
+            time.sleep(delay * 2 ** i)
+
+
+def ingest(paths, store, embed_texts, checkpoint: Checkpoint, namespace: str = "",
+           namespace_field: str | None = None, text_field: str = "text",
+           batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS,
+           report_every: float = 10.0, log=print) -> dict:
+    """
+    Stream documents from `paths`, chunk, embed `batch_size` chunks per
+    `embed_texts` call and hand each batch to a pool of `workers` upsert
+    threads while the next batch is embedded. At most 2 * workers batches
+    are in flight, so memory stays flat however large the input is.
+    Resumes from and advances `checkpoint`.
+    """
+    inflight = threading.BoundedSemaphore(2 * workers)
+    errors = []
+    counts = {"docs": 0, "chunks": 0}
+    t0 = last_report = time.perf_counter()
+
+    def write(seq, batch, vectors, marks):
+        try:
+            by_namespace = {}
+            for c, vec in zip(batch, vectors):
+                by_namespace.setdefault(c["namespace"], []).append((c["id"], vec, c["metadata"]))
+            for ns, items in by_namespace.items():
+                _retry(lambda: store.upsert(items, namespace=ns))
+            checkpoint.complete(seq, marks)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            inflight.release()
+
+    def chunks():
+        for path in paths:
+            start = checkpoint.start(path)
+            if start:
+                log(f"⏩ Resuming {path} at byte {start}")
+            for offset, doc_id, text, meta in iter_documents(path, start, text_field):
+                ns = str(meta.get(namespace_field, namespace)) if namespace_field else namespace
+                counts["docs"] += 1
+                pieces = chunk_text(text)
+                for i, piece in enumerate(pieces):
+                    last = i == len(pieces) - 1
+                    yield {"id": f"{doc_id}#{i}", "namespace": ns, "text": piece,
+                           "metadata": {**meta, "text": piece, "source": os.path.basename(path)}}, \
+                          ((path, offset) if last else None)
+            yield None, (path, os.path.getsize(path))       # file finished
+
+    seq = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        batch, marks = [], []
+
+        def flush():
+            nonlocal seq, batch, marks
+            vectors = _retry(lambda: embed_texts([c["text"] for c in batch])) if batch else []
+            inflight.acquire()
+            pool.submit(write, seq, batch, vectors, marks)
+            counts["chunks"] += len(batch)
+            seq += 1
+            batch, marks = [], []
+
+        for chunk, mark in chunks():
+            if errors:
+                break
+            if chunk is not None:
+                batch.append(chunk)
+            if mark is not None:
+                marks.append(mark)
+            if len(batch) >= batch_size:
+                flush()
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                last_report = now
+                log(f"📈 {counts['chunks']} chunks from {counts['docs']} docs "
+                    f"({counts['chunks'] / (now - t0):.0f} chunks/s)")
+        if (batch or marks) and not errors:
+            flush()
+
+    if errors:
+        raise RuntimeError(f"Ingestion stopped; resume from the checkpoint: {errors[0]}") from errors[0]
+    elapsed = time.perf_counter() - t0
+    return {"docs": counts["docs"], "chunks": counts["chunks"], "seconds": elapsed,
+            "chunks_per_s": counts["chunks"] / elapsed if elapsed else 0.0}
@@ -0,0 +1,146 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger("memory_writer")
+
+MEMORY_FLUSH_SIZE = int(os.getenv("MEMORY_FLUSH_SIZE", "32"))
+MEMORY_FLUSH_MS = float(os.getenv("MEMORY_FLUSH_MS", "500"))
+
+
+class MemoryWriter:
+    """
+    Write-behind queue for memory upserts.
+
+    `enqueue` returns immediately; a worker thread embeds everything pending
+    with one `embed_many(texts)` call and writes it with one bulk
+    `upsert(items, namespace=...)` per namespace once MEMORY_FLUSH_SIZE items are waiting or the oldest
+    has waited MEMORY_FLUSH_MS. `pending()` exposes not-yet-flushed
+    entries so readers can still see their own writes.
+
+    `close()` drains the queue and stops the worker; `start()` brings it
+    back (the server does both with its lifespan). While stopped, `enqueue`
+    writes synchronously instead of queueing.
+    """
+
+    def __init__(self, embed_many, upsert, flush_size: int = MEMORY_FLUSH_SIZE,
+                 flush_ms: float = MEMORY_FLUSH_MS):
+        self._embed_many = embed_many
+        self._upsert = upsert
+        self.flush_size = flush_size
+        self.flush_interval = flush_ms / 1000.0
+        self._pending = []            # dicts: id, user_id, text, metadata
+        self._inflight = []           # batch currently being written
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._closed = False
+        self._running = False         # worker thread alive and not past its exit check
+        self._thread = None
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.start()
+
+    def start(self) -> None:
+        """Start the worker, or restart it after `close()`."""
+        with self._cond:
+            self._closed = False
+            if self._running:
+                return                # still running (or still draining: it carries on)
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, entry: dict) -> None:
+        """
+        Queue {"id", "user_id", "namespace", "text", "metadata"} for the next
+        bulk upsert. After `close()` it is written right away instead.
+        """
+        with self._cond:
+            if not self._closed:
+                if not self._pending:
+                    self._oldest = time.monotonic()
+                self._pending.append(entry)
+                if len(self._pending) == 1 or len(self._pending) >= self.flush_size:
+                    self._cond.notify_all()    # start the timer / flush a full batch
+                return
+        self._write([entry])
+
+    def pending(self) -> list[dict]:
+        """Entries accepted but not yet confirmed written."""
+        with self._cond:
+            return self._inflight + self._pending
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._pending) >= self.flush_size:
+                        break
+                    if self._pending:
+                        wait = self._oldest + self.flush_interval - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._closed and not self._pending:
+                    self._running = False
+                    self._cond.notify_all()    # wake flush() waiters
+                    return
+                batch = self._pending[:self.flush_size]
+                self._pending = self._pending[self.flush_size:]
+                self._inflight = batch
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._inflight = []
+                    self._cond.notify_all()
+
+    def _write(self, batch) -> None:
+        try:
+            vectors = self._embed_many([e["text"] for e in batch])
+            by_namespace = {}
+            for e, v in zip(batch, vectors):
+                by_namespace.setdefault(e.get("namespace", ""), []).append((e["id"], v, e["metadata"]))
+            for namespace, items in by_namespace.items():
+                self._upsert(items, namespace=namespace)
+            self.written += len(batch)
+            logger.info(f"✅ Flushed {len(batch)} memories in {len(by_namespace)} upsert(s)")
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"❌ Write-behind flush of {len(batch)} memories failed: {e}")
+        finally:
+            self.flushes += 1
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Write everything pending now and wait until it is done."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._pending:
+                self._oldest = time.monotonic() - self.flush_interval
+                self._cond.notify_all()
+            while (self._pending or self._inflight) and self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return
+                self._cond.wait(remaining)
+            if self._running:
+                return
+            batch, self._pending = self._pending, []
+        if batch:
+            self._write(batch)        # no worker left: write the rest here
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """Flush and stop the worker (call on shutdown)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._pending) + len(self._inflight)
+        return {"queued": queued, "running": self._running, "flushes": self.flushes, "written": self.written, "failed": self.failed}
@@ -0,0 +1,155 @@
+"""
+Sentence embeddings through onnxruntime instead of torch.
+
+Export once (needs torch + transformers, e.g. on a dev box):
+    python -m modules.rag.onnx_embedder export models/minilm-onnx --int8
+Check it against the SentenceTransformer output:
+    python -m modules.rag.onnx_embedder check models/minilm-onnx --file model_int8.onnx
+(tests/test_onnx_embedder.py runs the same comparison under pytest.)
+Then serve with EMBED_BACKEND=onnx EMBED_ONNX_DIR=models/minilm-onnx
+(EMBED_ONNX_FILE=model_int8.onnx for the quantized graph).
+"""
+import os
+import argparse
+
+import numpy as np
+
+EMBED_ONNX_DIR = os.getenv("EMBED_ONNX_DIR", "models/minilm-onnx")
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "model.onnx")    # or model_int8.onnx
+EMBED_MAX_TOKENS = int(os.getenv("EMBED_MAX_TOKENS", "256"))    # all-MiniLM-L6-v2's max_seq_length
+ORT_EMBED_THREADS = int(os.getenv("ORT_EMBED_THREADS", "0"))    # 0 = onnxruntime default
+
+PARITY_TEXTS = [
+    "Harshita said she likes watching movies on weekends.",
+    "What is my name?",
+    "hi",
+    "The quick brown fox jumps over the lazy dog. " * 40,    # longer than EMBED_MAX_TOKENS
+]
+
+
+def _hub_name(model_name: str) -> str:
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+class OnnxEmbedder:
+    """
+    Drop-in for the parts of SentenceTransformer we use (`encode`,
+    `get_sentence_embedding_dimension`): tokenizer.json + an exported
+    transformer graph, then attention-masked mean pooling and L2
+    normalization, as in the all-MiniLM-L6-v2 pipeline.
+    """
+
+    def __init__(self, model_dir: str = EMBED_ONNX_DIR, model_file: str = EMBED_ONNX_FILE,
+                 max_tokens: int = EMBED_MAX_TOKENS, threads: int = ORT_EMBED_THREADS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_tokens)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0)
+        so = onnxruntime.SessionOptions()
+        if threads:
+            so.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, model_file), so,
+                                                    providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self._dim = self.session.get_outputs()[0].shape[-1]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dim
+
+    def encode(self, texts: list[str], normalize_embeddings: bool = True) -> np.ndarray:
+        """(N, D) float32 sentence embeddings."""
+        if not texts:
+            return np.zeros((0, self._dim), dtype=np.float32)
+        encs = self.tokenizer.encode_batch(list(texts))
+        feeds = {
+            "input_ids": np.array([e.ids for e in encs], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encs], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encs], dtype=np.int64),
+        }
+        tokens = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+        mask = feeds["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (tokens * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if normalize_embeddings:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+def export(out_dir: str, model_name: str, int8: bool = False) -> list[str]:
+    """Write tokenizer.json + model.onnx (and model_int8.onnx) for `model_name`."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+    tokenizer.save_pretrained(out_dir)
+    model = AutoModel.from_pretrained(_hub_name(model_name)).eval()
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids)[0]
+
+    sample = tokenizer(["export"], return_tensors="pt")
+    path = os.path.join(out_dir, "model.onnx")
+    axes = {0: "batch", 1: "tokens"}
+    torch.onnx.export(
+        TokenEmbeddings(model),
+        (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+        path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["token_embeddings"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes,
+                      "token_embeddings": axes},
+        opset_version=14,
+    )
+    written = [path]
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(out_dir, "model_int8.onnx")
+        quantize_dynamic(path, int8_path, weight_type=QuantType.QInt8)
+        written.append(int8_path)
+    return written
+
+
+def parity(model_dir: str, model_file: str, model_name: str, texts=PARITY_TEXTS) -> dict:
+    """Compare the ONNX embeddings with SentenceTransformer's for `texts`."""
+    from sentence_transformers import SentenceTransformer
+
+    ref = SentenceTransformer(model_name).encode(texts, normalize_embeddings=True)
+    out = OnnxEmbedder(model_dir, model_file).encode(texts)
+    cos = np.sum(ref * out, axis=1)
+    return {"min_cosine": float(cos.min()), "max_abs_diff": float(np.abs(ref - out).max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / check the ONNX sentence embedder.")
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("model_dir", nargs="?", default=EMBED_ONNX_DIR)
+    parser.add_argument("--model", default=os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--int8", action="store_true", help="also write a dynamic int8 model")
+    parser.add_argument("--file", default=EMBED_ONNX_FILE, help="graph to check")
+    parser.add_argument("--min-cosine", type=float, default=None,
+                        help="fail below this (default 0.9999 for float32, 0.99 for int8 graphs)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for path in export(args.model_dir, args.model, int8=args.int8):
+            print(f"[EMBED] Wrote {path}")
+        return
+    result = parity(args.model_dir, args.file, args.model)
+    floor = args.min_cosine or (0.99 if "int8" in args.file else 0.9999)
+    print(f"[EMBED] {args.file}: min cosine {result['min_cosine']:.6f}, "
+          f"max |diff| {result['max_abs_diff']:.2e} (floor {floor})")
+    if result["min_cosine"] < floor:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
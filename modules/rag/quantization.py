@@ -0,0 +1,51 @@
+import numpy as np
+
+# float32: 4 B/dim, float16: 2 B/dim, int8: 1 B/dim + one float32 scale per vector.
+QUANT_DTYPES = ("float32", "float16", "int8")
+
+
+def row_dtype(dim: int, dtype: str) -> np.dtype:
+    """Storage dtype of one stored vector."""
+    if dtype == "float32":
+        return np.dtype((np.float32, dim))
+    if dtype == "float16":
+        return np.dtype((np.float16, dim))
+    if dtype == "int8":
+        return np.dtype([("q", np.int8, dim), ("s", np.float32)])
+    raise ValueError(f"Unknown vector dtype {dtype!r}; expected one of {QUANT_DTYPES}")
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> np.ndarray:
+    """(N, D) float vectors -> N stored rows (int8 uses a per-vector symmetric scale)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    out = np.empty(len(vectors), dtype=row_dtype(vectors.shape[1], dtype))
+    if dtype == "int8":
+        scale = np.abs(vectors).max(axis=1) / 127.0 + 1e-12
+        out["q"] = np.round(vectors / scale[:, None]).astype(np.int8)
+        out["s"] = scale
+    else:
+        out[...] = vectors
+    return out
+
+
+def dequantize(rows: np.ndarray) -> np.ndarray:
+    """Stored rows -> (N, D) float32."""
+    if rows.dtype.names:
+        return rows["q"].astype(np.float32) * rows["s"][:, None]
+    return np.asarray(rows, dtype=np.float32).reshape(len(rows), -1)
+
+
+def dot(rows: np.ndarray, probe: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Scores of a float32 probe against stored rows, dequantizing chunk by chunk."""
+    probe = np.asarray(probe, dtype=np.float32)
+    if rows.dtype.names is None and rows.dtype.base == np.float32:
+        return rows.reshape(len(rows), -1) @ probe
+    out = np.empty(len(rows), dtype=np.float32)
+    for i in range(0, len(rows), chunk):
+        part = rows[i:i + chunk]
+        if part.dtype.names:
+            out[i:i + chunk] = (part["q"].astype(np.float32) @ probe) * part["s"]
+        else:
+            out[i:i + chunk] = part.astype(np.float32).reshape(len(part), -1) @ probe
+    return out
+
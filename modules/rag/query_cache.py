@@ -0,0 +1,135 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+from modules.rag.embedding_cache import normalize_text
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))      # entries; 0 disables
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "60"))        # seconds
+
+
+class QueryCache:
+    """
+    LRU + TTL cache of retrieval results keyed by (namespace, normalized
+    query, top_k).
+
+    Writes to a namespace call `invalidate(namespace, items)`, which bumps
+    its generation and drops the entries the written (id, vector, ...)
+    items could change: those whose k-th score an item beats (or that have
+    fewer than k matches). Entries stored without their query vector, and
+    every entry when `items` is None, are dropped. A result computed while
+    a write was in progress is not stored: take `generation(ns)` before
+    querying and pass it to `put`.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()       # key -> (expires_at, result, query vector or None)
+        self._by_namespace = {}             # namespace -> set of keys
+        self._generations = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(namespace: str, query: str, top_k: int) -> tuple:
+        return namespace, normalize_text(query), top_k
+
+    def _drop_locked(self, key) -> None:
+        self._entries.pop(key, None)
+        keys = self._by_namespace.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_namespace[key[0]]
+
+    def get(self, namespace: str, query: str, top_k: int) -> dict | None:
+        if self.max_entries <= 0:
+            return None
+        key = self._key(namespace, query, top_k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop_locked(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {"matches": list(entry[1]["matches"])}
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def put(self, namespace: str, query: str, top_k: int, result: dict, generation: int,
+            vector=None) -> None:
+        if self.max_entries <= 0:
+            return
+        key = self._key(namespace, query, top_k)
+        with self._lock:
+            if self._generations.get(namespace, 0) != generation:
+                return                      # a write landed while we were querying
+            self._drop_locked(key)
+            vector = None if vector is None else np.asarray(vector, dtype=np.float32)
+            self._entries[key] = (time.monotonic() + self.ttl, {"matches": list(result.get("matches", []))}, vector)
+            self._by_namespace.setdefault(namespace, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop_locked(oldest)
+                self.evictions += 1
+
+    @staticmethod
+    def _affected(key, entry, items) -> bool:
+        _, result, vector = entry
+        if vector is None:
+            return True
+        matches = result["matches"]
+        ids = {m["id"] for m in matches}
+        kth = matches[-1]["score"] if len(matches) >= key[2] else -np.inf
+        for vid, vec, *_ in items:
+            if vid in ids:
+                continue                    # content-addressed: same id, same vector
+            vec = np.asarray(vec, dtype=np.float32)
+            if float(vector @ vec) / (np.linalg.norm(vec) + 1e-8) > kth:
+                return True
+        return False
+
+    def invalidate(self, namespace: str, items=None) -> None:
+        """
+        Call on each write to `namespace`: forget the cached results the
+        written (id, vector, ...) `items` could enter, or all of them.
+        """
+        items = None if items is None else list(items)
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            keys = self._by_namespace.get(namespace, set())
+            for key in list(keys):
+                if items is None or self._affected(key, self._entries[key], items):
+                    self._drop_locked(key)
+            self.invalidations += 1
+
+    def has(self, namespace: str) -> bool:
+        """Whether any result of `namespace` is cached (writes can skip embedding otherwise)."""
+        with self._lock:
+            return namespace in self._by_namespace
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
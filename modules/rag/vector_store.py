@@ -0,0 +1,314 @@
+import os
+import json
+import logging
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from threading import Lock
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:                       # Windows: single writer only
+    fcntl = None
+
+from modules.rag import quantization
+
+logger = logging.getLogger("vector_store")
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")            # "pinecone" or "local"
+LOCAL_STORE_DIR = os.getenv("LOCAL_STORE_DIR", "data/vector_store")
+LOCAL_STORE_DTYPE = os.getenv("LOCAL_STORE_DTYPE", "float16")       # float32 | float16 | int8
+
+
+class VectorStore(ABC):
+    """
+    Minimal Pinecone-shaped interface shared by every backend.
+
+    upsert(items, namespace) takes (id, vector, metadata) tuples;
+    query(...) returns {"matches": [{"id", "score", "metadata"}, ...]}.
+    """
+
+    @abstractmethod
+    def upsert(self, items, namespace: str = "") -> None:
+        ...
+
+    @abstractmethod
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True,
+              filter: dict | None = None, namespace: str = "") -> dict:
+        ...
+
+    @abstractmethod
+    def delete(self, ids, namespace: str = "") -> None:
+        ...
+
+
+class PineconeStore(VectorStore):
+    """Pinecone serverless index (one network round trip per call)."""
+
+    def __init__(self, index_name: str, dim: int, api_key: str | None = None):
+        from pinecone import Pinecone, ServerlessSpec
+
+        api_key = api_key or os.getenv("PINECONE_API_KEY")
+        if not api_key:
+            raise ValueError("❌ Missing PINECONE_API_KEY in environment.")
+        pc = Pinecone(api_key=api_key)
+        if index_name not in [i["name"] for i in pc.list_indexes()]:
+            logger.info(f"📦 Creating Pinecone index '{index_name}' (dim={dim})...")
+            pc.create_index(
+                name=index_name,
+                dimension=dim,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+            )
+        self.index = pc.Index(index_name)
+        logger.info(f"🔗 Connected to Pinecone index: {index_name}")
+
+    def upsert(self, items, namespace: str = "") -> None:
+        vectors = [(vid, np.asarray(vec, dtype=float).tolist(), *rest) for vid, vec, *rest in items]
+        self.index.upsert(vectors=vectors, namespace=namespace)
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True,
+              filter: dict | None = None, namespace: str = "") -> dict:
+        return self.index.query(vector=np.asarray(vector, dtype=float).tolist(), top_k=top_k,
+                                include_metadata=include_metadata, filter=filter,
+                                namespace=namespace)
+
+    def delete(self, ids, namespace: str = "") -> None:
+        self.index.delete(ids=list(ids), namespace=namespace)
+
+
+def _matches_filter(metadata: dict, flt: dict | None) -> bool:
+    """Subset of Pinecone's metadata filter: equality, $eq, $ne, $in, $nin."""
+    if not flt:
+        return True
+    for key, cond in flt.items():
+        value = metadata.get(key)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, arg in cond.items():
+            if op == "$eq" and value != arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+    return True
+
+
+class _Partition:
+    """One namespace: unit-length rows in a growable (possibly quantized) array."""
+
+    def __init__(self, row_dtype: np.dtype):
+        self.row_dtype = row_dtype
+        self.rows = np.zeros(64, dtype=row_dtype)
+        self.size = 0
+        self.ids = []
+        self.metadata = []
+        self.row_of = {}
+
+    def put(self, vid: str, row, meta: dict) -> None:
+        idx = self.row_of.get(vid)
+        if idx is None:
+            if self.size == len(self.rows):
+                grown = np.zeros(2 * len(self.rows), dtype=self.row_dtype)
+                grown[:self.size] = self.rows[:self.size]
+                self.rows = grown
+            idx = self.size
+            self.size += 1
+            self.ids.append(vid)
+            self.metadata.append(meta)
+            self.row_of[vid] = idx
+        self.rows[idx] = row
+        self.metadata[idx] = meta
+
+    def remove(self, vid: str) -> None:
+        idx = self.row_of.pop(vid, None)
+        if idx is None:
+            return
+        last = self.size - 1
+        if idx != last:                      # move the last row into the hole
+            self.rows[idx] = self.rows[last]
+            self.ids[idx] = self.ids[last]
+            self.metadata[idx] = self.metadata[last]
+            self.row_of[self.ids[idx]] = idx
+        self.ids.pop()
+        self.metadata.pop()
+        self.size = last
+
+
+class LocalStore(VectorStore):
+    """
+    In-process vector store: exact cosine top-k over one matrix per
+    namespace, with metadata filters. Rows are stored as float32, float16 or
+    int8 + per-row scale (`dtype`), and dequantized chunk-wise when scored.
+
+    Persisted append-only under `path`: rows in the storage dtype go to
+    `vectors.<dtype>` and one JSON line per write to `records.jsonl`; on load
+    the last record for each id wins. An existing store keeps the dtype in its
+    meta.json. Pass path="" for a purely in-memory store (tests, tooling).
+
+    Several processes may write to the same `path` (the server and
+    rag_upsert.py, several uvicorn workers): appends hold an exclusive file
+    lock and take their row numbers from the file size. Each process only
+    sees what was on disk when it opened the store plus its own writes;
+    restart the server to pick up rows written by another process.
+    """
+
+    def __init__(self, dim: int, path: str = LOCAL_STORE_DIR, dtype: str = LOCAL_STORE_DTYPE):
+        self.dim = dim
+        self.path = path
+        self.dtype = dtype
+        self.row_dtype = quantization.row_dtype(dim, dtype)
+        self._parts = {}
+        self._lock = Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def _part(self, namespace: str) -> _Partition:
+        part = self._parts.get(namespace)
+        if part is None:
+            part = self._parts[namespace] = _Partition(self.row_dtype)
+        return part
+
+    def _normalize(self, vectors) -> np.ndarray:
+        mat = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if mat.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {mat.shape[1]}")
+        return mat / (np.linalg.norm(mat, axis=1, keepdims=True) + 1e-8)
+
+    # Persistence
+    def _load(self) -> None:
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["dim"] != self.dim:
+                raise ValueError(f"Local store at {self.path} is {meta['dim']}-dim, expected {self.dim}")
+            self.dtype = meta.get("dtype", "float32")     # stores predating quantization
+            self.row_dtype = quantization.row_dtype(self.dim, self.dtype)
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": self.dim, "dtype": self.dtype}, f)
+
+        vec_path = self._vectors_path()
+        rec_path = os.path.join(self.path, "records.jsonl")
+        if not os.path.exists(rec_path) or not os.path.exists(vec_path):
+            return
+        with open(vec_path, "ab") as lock, _file_lock(lock):     # no writer mid-append while we read
+            n_rows = self._complete_rows(lock)
+            if n_rows:
+                self._read_records(vec_path, rec_path, n_rows)
+        n = sum(p.size for p in self._parts.values())
+        logger.info(f"📂 Loaded {n} vectors from local store {self.path}")
+
+    def _read_records(self, vec_path: str, rec_path: str, n_rows: int) -> None:
+        vectors = np.memmap(vec_path, dtype=self.row_dtype, mode="r", shape=(n_rows,))
+        with open(rec_path, "r+b") as f:
+            good = 0
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    f.truncate(good)              # torn final line after a crash
+                    break
+                good += len(line)
+                part = self._part(rec.get("ns", ""))
+                if rec.get("deleted"):
+                    part.remove(rec["id"])
+                elif rec["row"] < len(vectors):
+                    part.put(rec["id"], vectors[rec["row"]], rec.get("metadata") or {})
+
+    def _vectors_path(self) -> str:
+        name = "vectors.f32" if self.dtype == "float32" else f"vectors.{self.dtype}"
+        return os.path.join(self.path, name)
+
+    def _complete_rows(self, f) -> int:
+        """Rows in the (locked) vectors file; a torn final row from a crash is dropped."""
+        row_bytes = self.row_dtype.itemsize
+        size = f.seek(0, os.SEEK_END)
+        if size % row_bytes:
+            f.truncate(size - size % row_bytes)
+        return size // row_bytes
+
+    def _append(self, ns: str, ids, rows, metas) -> None:
+        if not self.path:
+            return
+        with open(self._vectors_path(), "ab") as f, _file_lock(f):
+            first = self._complete_rows(f)      # other processes may have appended since
+            f.write(np.ascontiguousarray(rows).tobytes())
+            f.flush()
+            with open(os.path.join(self.path, "records.jsonl"), "a") as rec:
+                for i, (vid, meta) in enumerate(zip(ids, metas)):
+                    rec.write(json.dumps({"ns": ns, "id": vid, "row": first + i,
+                                          "metadata": meta}) + "\n")
+
+    # VectorStore API
+    def upsert(self, items, namespace: str = "") -> None:
+        items = list(items)
+        if not items:
+            return
+        ids = [it[0] for it in items]
+        metas = [dict(it[2]) if len(it) > 2 and it[2] else {} for it in items]
+        rows = quantization.quantize(self._normalize([it[1] for it in items]), self.dtype)
+        with self._lock:
+            part = self._part(namespace)
+            for vid, row, meta in zip(ids, rows, metas):
+                part.put(vid, row, meta)
+            self._append(namespace, ids, rows, metas)
+
+    def query(self, vector, top_k: int = 3, include_metadata: bool = True,
+              filter: dict | None = None, namespace: str = "") -> dict:
+        probe = self._normalize(vector)[0]
+        with self._lock:
+            part = self._parts.get(namespace)
+            if part is None or part.size == 0:
+                return {"matches": [], "namespace": namespace}
+            sims = quantization.dot(part.rows[:part.size], probe)
+            if filter:
+                keep = np.array([_matches_filter(m, filter) for m in part.metadata], dtype=bool)
+                sims = np.where(keep, sims, -np.inf)
+            k = min(top_k, part.size)
+            top = np.argpartition(-sims, k - 1)[:k]
+            top = top[np.argsort(-sims[top])]
+            matches = [
+                {"id": part.ids[r], "score": float(sims[r]),
+                 **({"metadata": dict(part.metadata[r])} if include_metadata else {})}
+                for r in top if sims[r] > -np.inf
+            ]
+        return {"matches": matches, "namespace": namespace}
+
+    def delete(self, ids, namespace: str = "") -> None:
+        with self._lock:
+            part = self._part(namespace)
+            for vid in ids:
+                part.remove(vid)
+            if self.path:
+                with open(self._vectors_path(), "ab") as lock, _file_lock(lock), \
+                        open(os.path.join(self.path, "records.jsonl"), "a") as f:
+                    for vid in ids:
+                        f.write(json.dumps({"ns": namespace, "id": vid, "deleted": True}) + "\n")
+
+
+@contextmanager
+def _file_lock(f):
+    """Exclusive advisory lock on an open file, shared by every process using the store."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield f
+    finally:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def make_store(dim: int, backend: str = VECTOR_STORE, index_name: str | None = None) -> VectorStore:
+    """Build the backend selected by VECTOR_STORE ("pinecone" or "local")."""
+    if backend == "local":
+        return LocalStore(dim)
+    if backend == "pinecone":
+        return PineconeStore(index_name or os.getenv("PINECONE_INDEX", "video-chatbot"), dim)
+    raise ValueError(f"Unknown VECTOR_STORE backend: {backend!r}")
@@ -0,0 +1,93 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("registry")
+
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", "4"))
+
+
+class Component:
+    """One lazily loaded dependency and its load state."""
+
+    def __init__(self, name: str, loader, required: bool = True):
+        self.name = name
+        self.loader = loader
+        self.required = required     # counts towards readiness
+        self.value = None
+        self.state = "idle"          # idle | loading | ready | failed
+        self.error = None
+        self.seconds = None
+        self.lock = threading.Lock()
+
+
+class Registry:
+    """
+    Heavy dependencies (models, remote index connections) registered by
+    name and built on the first `get`, exactly once even with concurrent
+    callers. A failed load is retried by the next `get`. `warmup` loads
+    several in parallel; `status` / `ready` report what is loaded.
+    """
+
+    def __init__(self):
+        self._components = {}
+
+    def register(self, name: str, loader, required: bool = True) -> None:
+        self._components[name] = Component(name, loader, required)
+
+    def get(self, name: str):
+        c = self._components[name]
+        if c.state == "ready":
+            return c.value
+        with c.lock:
+            if c.state != "ready":
+                c.state = "loading"
+                t0 = time.perf_counter()
+                try:
+                    c.value = c.loader()
+                except Exception as e:
+                    c.state, c.error = "failed", str(e)
+                    logger.error(f"❌ Loading {name} failed: {e}")
+                    raise
+                c.seconds = time.perf_counter() - t0
+                c.state, c.error = "ready", None
+                logger.info(f"✅ Loaded {name} in {c.seconds:.1f}s")
+        return c.value
+
+    def loaded(self, name: str) -> bool:
+        return self._components[name].state == "ready"
+
+    def warmup(self, names=None, workers: int = WARMUP_WORKERS) -> dict:
+        """Load `names` (default: all) in parallel; failures are reported in the status, not raised."""
+        names = list(names or self._components)
+
+        def load(name):
+            try:
+                self.get(name)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(names))),
+                                thread_name_prefix="warmup") as pool:
+            list(pool.map(load, names))
+        return self.status()
+
+    def ready(self) -> bool:
+        return all(c.state == "ready" for c in self._components.values() if c.required)
+
+    def status(self) -> dict:
+        return {
+            c.name: {
+                "state": c.state,
+                "required": c.required,
+                "seconds": None if c.seconds is None else round(c.seconds, 3),
+                **({"error": c.error} if c.error else {}),
+            }
+            for c in self._components.values()
+        }
+
+
+# Process-wide registry: rag_utils, embeddings and detection register here.
+components = Registry()
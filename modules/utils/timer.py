@@ -0,0 +1,46 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class StageTimer:
+    """Wall-clock samples per named stage, summarized as p50/p95/p99 and FPS."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - t0)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.samples[name].append(seconds)
+
+    def summary(self) -> dict:
+        out = {}
+        for name, values in self.samples.items():
+            ms = np.asarray(values) * 1000.0
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            out[name] = {
+                "count": len(ms),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "fps": float(1000.0 / ms.mean()) if ms.mean() > 0 else float("inf"),
+            }
+        return out
+
+    def report(self) -> str:
+        lines = [f"{'stage':<18}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fps':>10}"]
+        for name, s in self.summary().items():
+            lines.append(
+                f"{name:<18}{s['count']:>7}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}"
+                f"{s['p99_ms']:>10.2f}{s['fps']:>10.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,108 @@
+import os
+import json
+import numpy as np
+
+# Recall/latency knob: how many inverted lists each probe scans.
+ANN_NPROBE = int(os.getenv("FACE_ANN_NPROBE", "8"))
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iters: int, seed: int) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns (nlist, D) unit centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > 256 * nlist:
+        sample = vectors[rng.choice(len(vectors), 256 * nlist, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = (sample @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = ~sums.any(axis=1)
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-8)
+    return centroids.astype(np.float32)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    out = np.empty(len(vectors), dtype=np.int32)
+    for i in range(0, len(vectors), chunk):
+        out[i:i + chunk] = (vectors[i:i + chunk] @ centroids.T).argmax(axis=1)
+    return out
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over unit-length face embeddings.
+
+    Rows are grouped by their nearest k-means centroid, so a probe only
+    scores the rows of its `nprobe` closest lists instead of the whole
+    gallery. Saved as plain .npy files and memory-mapped on load.
+    """
+
+    def __init__(self, centroids, vectors, labels, offsets, names, fingerprint=""):
+        self.centroids = centroids      # (L, D)
+        self.vectors = vectors          # (N, D), grouped by list
+        self.labels = labels            # (N,) index into names
+        self.offsets = offsets          # (L + 1,) list boundaries into vectors
+        self.names = names
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, labels: np.ndarray, names: list, nlist: int | None = None,
+              iters: int = 10, seed: int = 0, fingerprint: str = "") -> "IVFIndex":
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if nlist is None:
+            nlist = int(4 * np.sqrt(len(vectors)))
+        nlist = max(1, min(nlist, len(vectors)))
+        centroids = _kmeans(vectors, nlist, iters, seed)
+        assign = _assign(vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+        return cls(centroids, vectors[order], np.asarray(labels, dtype=np.int32)[order],
+                   offsets, list(names), fingerprint)
+
+    def match_many(self, probes: np.ndarray, threshold: float,
+                   nprobe: int = ANN_NPROBE) -> list[tuple[str | None, float]]:
+        """Best (name or None, score) per unit-length probe row."""
+        nprobe = max(1, min(nprobe, len(self.centroids)))
+        lists = np.argpartition(-(probes @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        out = []
+        for probe, probe_lists in zip(probes, lists):
+            rows = np.concatenate([
+                np.arange(self.offsets[l], self.offsets[l + 1]) for l in probe_lists
+            ])
+            if not len(rows):
+                out.append((None, 0.0))
+                continue
+            sims = self.vectors[rows] @ probe
+            best = int(sims.argmax())
+            score = float(sims[best])
+            name = self.names[self.labels[rows[best]]]
+            out.append((name if score >= threshold else None, score))
+        return out
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for key in ("centroids", "vectors", "labels", "offsets"):
+            np.save(os.path.join(path, f"{key}.npy"), getattr(self, key))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"names": self.names, "fingerprint": self.fingerprint}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex | None":
+        """Memory-map a saved index, or None if it is missing or unreadable."""
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            arrays = {
+                key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r")
+                for key in ("centroids", "vectors", "labels", "offsets")
+            }
+        except (OSError, ValueError):
+            return None
+        arrays["centroids"] = np.asarray(arrays["centroids"])   # small; keep in RAM
+        return cls(names=meta["names"], fingerprint=meta.get("fingerprint", ""), **arrays)
@@ -1,111 +1,320 @@
 import os
+import re
+import glob
+import shutil
 import time
+import uuid
 import cv2
 import numpy as np
-from insightface.app import FaceAnalysis
-from threading import Lock
+from threading import Lock, Thread
+
+from modules.video.gallery import FaceGallery
+from modules.video.ann_index import IVFIndex
+from modules.video import embedding_cache
+from modules.video.session import RecognitionSession
+from modules.utils.registry import components
 
 #Utils
-def cosine_similarity(a, b):
-    denom = (np.linalg.norm(a) * np.linalg.norm(b)) + 1e-8
-    return float(np.dot(a, b) / denom)
+def _size_env(name, default):
+    w, _, h = os.getenv(name, default).partition(",")
+    return int(w), int(h or w)
 
 #Config 
 USERS_DIR = "data/users"       # folders per user, each contains a few face images
+ANN_INDEX_DIR = os.getenv("FACE_ANN_DIR", "data/face_index")  # persisted IVF index (large galleries only)
 EMB_THRESHOLD = 0.60           # similarity threshold
 IDLE_SECONDS = 7               # how long without a face before we mark idle
+TRACKING = os.getenv("FACE_TRACKING", "1") == "1"   # carry identity between recognitions
+RECOGNIZE_EVERY_N = int(os.getenv("FACE_RECOGNIZE_EVERY_N", "10"))  # full ArcFace at least this often
+TRACK_MIN_IOU = float(os.getenv("FACE_TRACK_MIN_IOU", "0.5"))      # lower IoU vs last box → re-recognize
+MODEL_NAME = os.getenv("FACE_MODEL_PACK", "buffalo_l")  # insightface pack, e.g. buffalo_s (also keys the embedding cache)
+MODEL_ROOT = os.getenv("FACE_MODEL_ROOT", "~/.insightface")
+FACE_MODULES = tuple(os.getenv("FACE_MODULES", "detection,recognition").split(","))
+DET_SIZE = _size_env("FACE_DET_SIZE", "640,640")  # detector input size; frames are decoded down towards it
+CTX_ID = int(os.getenv("FACE_CTX_ID", "-1"))       # -1 = CPU, >=0 = CUDA device
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))  # 0 = onnxruntime default
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "0"))
+
+# Pack files for modules we never need are skipped before onnxruntime opens them.
+_MODULE_FILE_PREFIXES = {
+    "landmark_3d_68": "1k3d68",
+    "landmark_2d_106": "2d106det",
+    "genderage": "genderage",
+}
 
 #Globals (shared state)
+# Presence of the default session, kept for single-camera callers such as
+# video_chatbot.py. /video-stream connections each get their own session.
 lock = Lock()
 current_user = None
 system_active = False
-_last_seen = 0.0
-_user_embeddings = {}
+_gallery = FaceGallery()         # all reference embeddings, one row each
+_index_lock = Lock()
+_enroll_lock = Lock()            # serializes writes under USERS_DIR
 
-#ArcFace
-print("[DETECTION] Loading ArcFace...")
-_app = FaceAnalysis(name="buffalo_l")
 
-try:
-    _app.prepare(ctx_id=0)   # try GPU
-    print("[DETECTION] Using GPU for face recognition")
-except Exception as e:
-    print("[DETECTION] GPU failed, falling back to CPU:", e)
-    _app.prepare(ctx_id=-1)  # fallback CPU
+#ArcFace (lazy)
+def _load_models() -> dict:
+    print(f"[DETECTION] Loading {MODEL_NAME} {list(FACE_MODULES)} "
+          f"(det_size={DET_SIZE}, ctx_id={CTX_ID})...")
+    import onnxruntime
+    from insightface.model_zoo.model_zoo import ModelRouter
+    from insightface.utils.storage import ensure_available
 
-# Precompute User Embeddings
-print("[DETECTION] Precomputing user embeddings...")
-for username in os.listdir(USERS_DIR):
-    user_path = os.path.join(USERS_DIR, username)
-    if not os.path.isdir(user_path):
-        continue
-    embs = []
-    for f in os.listdir(user_path):
-        img_path = os.path.join(user_path, f)
-        if not os.path.isfile(img_path):
+    onnxruntime.set_default_logger_severity(3)
+    so = onnxruntime.SessionOptions()
+    if ORT_INTRA_OP_THREADS:
+        so.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    if ORT_INTER_OP_THREADS:
+        so.inter_op_num_threads = ORT_INTER_OP_THREADS
+    providers = ["CPUExecutionProvider"]
+    if CTX_ID >= 0:
+        providers.insert(0, "CUDAExecutionProvider")
+
+    skip = tuple(p for m, p in _MODULE_FILE_PREFIXES.items() if m not in FACE_MODULES)
+    model_dir = ensure_available("models", MODEL_NAME, root=MODEL_ROOT)
+    models = {}
+    for onnx_file in sorted(glob.glob(os.path.join(model_dir, "*.onnx"))):
+        if os.path.basename(onnx_file).startswith(skip):
             continue
-        img = cv2.imread(img_path)
-        if img is None:
+        model = ModelRouter(onnx_file).get_model(sess_options=so, providers=providers)
+        if model is None or model.taskname not in FACE_MODULES or model.taskname in models:
             continue
-        faces = _app.get(img)  # expects BGR
-        if not faces:
+        models[model.taskname] = model
+
+    missing = {"detection", "recognition"} - set(models)
+    if missing:
+        raise RuntimeError(f"Model pack {MODEL_NAME} lacks {sorted(missing)}")
+    models["detection"].prepare(CTX_ID, input_size=DET_SIZE, det_thresh=0.5)
+    models["recognition"].prepare(CTX_ID)
+    return models
+
+
+def get_models() -> dict:
+    """{taskname: insightface model}, loaded once on first use."""
+    return components.get("face_models")
+
+
+# Precompute User Embeddings
+def _embed_image(img_path: str):
+    img = cv2.imread(img_path)
+    if img is None:
+        return None
+    face = _top_face(img)  # expects BGR
+    if face is None:
+        return None
+    emb = _embed_faces([img], [face[1]])[0]
+    return emb / (np.linalg.norm(emb) + 1e-8)
+
+def _load_gallery() -> FaceGallery:
+    """Load enrollment embeddings (cached per image) into the gallery."""
+    print("[DETECTION] Loading user embeddings (cached per image)...")
+    for username in _gallery.users():    # a retry after a failed load starts clean
+        _gallery.remove(username)
+    n_embedded = 0
+    for username in os.listdir(USERS_DIR) if os.path.isdir(USERS_DIR) else []:
+        user_path = os.path.join(USERS_DIR, username)
+        if not os.path.isdir(user_path):
             continue
-        embs.append(faces[0].normed_embedding)
-    if embs:
-        _user_embeddings[username] = embs
+        embs, n = embedding_cache.load_user_embeddings(user_path, _embed_image, MODEL_NAME)
+        n_embedded += n
+        if embs:
+            _gallery.add(username, embs)
+    print(f"[DETECTION] Embedded {n_embedded} new/changed images")
+    print(f"[DETECTION] Users loaded: {_gallery.users() or '[none]'}")
+
+    if len(_gallery) >= _gallery.ann_min_rows:
+        if _gallery.attach_index(IVFIndex.load(ANN_INDEX_DIR)):
+            print(f"[DETECTION] Memory-mapped ANN index from {ANN_INDEX_DIR}")
+        else:
+            Thread(target=refresh_index, daemon=True).start()
+    return _gallery
+
+
+# Loaded on the first frame (or by warmup()), not at import.
+components.register("face_models", _load_models)
+components.register("face_gallery", _load_gallery)
 
-print(f"[DETECTION] Users loaded: {list(_user_embeddings.keys()) or '[none]'}")
+
+def get_gallery() -> FaceGallery:
+    """The enrollment gallery, loaded once on first use."""
+    return components.get("face_gallery")
+
+
+def refresh_index() -> bool:
+    """
+    Rebuild and save the ANN index if the gallery is large enough and the
+    current index is stale. Matching stays exact until the new index lands.
+    """
+    with _index_lock:
+        if len(_gallery) < _gallery.ann_min_rows or _gallery.index_is_current():
+            return False
+        t0 = time.time()
+        index = _gallery.build_index()
+        index.save(ANN_INDEX_DIR)
+        print(f"[DETECTION] Built ANN index over {len(index)} embeddings in {time.time() - t0:.1f}s")
+        return True
+
+
+def warmup() -> None:
+    """Load models and gallery now instead of on the first frame."""
+    get_models()
+    get_gallery()
+    _top_face(np.zeros((DET_SIZE[1], DET_SIZE[0], 3), dtype=np.uint8))
 
 
 def _match_user(emb: np.ndarray) -> str | None:
     """Return best-matching username or None."""
-    best_user = None
-    best_sim = 0.0
-    for user, emb_list in _user_embeddings.items():
-        for ref in emb_list:
-            sim = cosine_similarity(emb, ref)
-            if sim > best_sim:
-                best_sim = sim
-                best_user = user
-    if best_sim >= EMB_THRESHOLD:
-        return best_user
-    return None
-
-
-def process_frame(frame):
+    user, _ = get_gallery().match(emb, EMB_THRESHOLD)
+    return user
+
+
+def new_session() -> RecognitionSession:
+    """Fresh presence/idle state for one video stream."""
+    return RecognitionSession(idle_seconds=IDLE_SECONDS)
+
+_default_session = RecognitionSession(idle_seconds=IDLE_SECONDS, lock=lock)
+
+
+def _top_face(frame):
+    """Run only the detector and return (bbox, kps) of the best face, or None."""
+    bboxes, kpss = get_models()["detection"].detect(frame, max_num=0, metric="default")
+    if bboxes.shape[0] == 0:
+        return None
+    return bboxes[0], kpss[0]
+
+
+def _embed_faces(frames, kpss) -> np.ndarray:
+    """Align one face per frame and embed all crops in a single ArcFace batch."""
+    from insightface.utils import face_align
+
+    rec = get_models()["recognition"]
+    crops = [
+        face_align.norm_crop(frame, landmark=kps, image_size=rec.input_size[0])
+        for frame, kps in zip(frames, kpss)
+    ]
+    return rec.get_feat(crops)
+
+
+def process_frames(frames, sessions):
+    """
+    Run detection + recognition for frames from many streams at once.
+    frames: BGR numpy arrays; sessions: the RecognitionSession each came from.
+    Returns one (user, active) per frame.
+
+    Only ArcFace runs as one batch. The SCRFD packs (e.g. buffalo_l's
+    det_10g) are exported with a fixed batch of 1, so detection stays one
+    forward pass per frame.
+    """
+    now = time.time()
+    found = [_top_face(frame) for frame in frames]
+    hits = [i for i, face in enumerate(found) if face is not None]
+    print(f"[DEBUG] Faces detected in {len(hits)}/{len(frames)} frames")   # LOGGING
+
+    # Detect-then-track: only faces that are new, stale or have moved are embedded.
+    to_embed = [
+        i for i in hits
+        if not TRACKING or sessions[i].needs_recognition(found[i][0], RECOGNIZE_EVERY_N, TRACK_MIN_IOU)
+    ]
+    recognized = [None] * len(frames)
+    if to_embed:
+        feats = _embed_faces([frames[i] for i in to_embed], [found[i][1] for i in to_embed])
+        for i, (user, _) in zip(to_embed, get_gallery().match_many(feats, EMB_THRESHOLD)):
+            recognized[i] = user
+
+    if TRACKING:
+        embedded = set(to_embed)
+        for i, session in enumerate(sessions):
+            if found[i] is None:
+                session.reset_track()
+            else:
+                recognized[i] = session.track(found[i][0], recognized[i], i in embedded)
+
+    return [
+        session.update(found[i] is not None, recognized[i], now)
+        for i, session in enumerate(sessions)
+    ]
+
+
+def process_frame(frame, session: RecognitionSession | None = None):
     """
-    Update internal state based on a single frame and return (user, active).
+    Update a session based on a single frame and return (user, active).
     frame: numpy array (BGR) from cv2.imdecode
+    session: defaults to the module-level session behind `current_user`.
     """
-    global current_user, system_active, _last_seen
-
-    # Detect faces
-    faces = _app.get(frame)
-    print(f"[DEBUG] Faces detected: {len(faces)}")   # LOGGING
-
-    recognized = None
-
-    if faces:
-        emb = faces[0].normed_embedding
-        recognized = _match_user(emb)
-        if recognized:
-            print(f"[DEBUG] Recognized user: {recognized}")
-            _last_seen = time.time()
-            with lock:
-                current_user = recognized
-                system_active = True
-        else:
-            print("[DEBUG] Unknown face detected")
-            _last_seen = time.time()
-            with lock:
-                current_user = None
-                system_active = True
-    else:
-        if time.time() - _last_seen > IDLE_SECONDS:
-            with lock:
-                current_user = None
-                system_active = False
-            print("[DEBUG] No face for a while → system idle")
+    global current_user, system_active
+
+    if session is not None:
+        return process_frames([frame], [session])[0]
 
+    user, active = process_frames([frame], [_default_session])[0]
     with lock:
-        return current_user, system_active
+        current_user, system_active = user, active
+    return user, active
+
+
+#Enrollment (hot reload, no restart)
+_USERNAME_RE = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]{0,63}$")
+
+
+def _user_path(username: str) -> str:
+    if not _USERNAME_RE.match(username or ""):
+        raise ValueError(f"Invalid username: {username!r}")
+    return os.path.join(USERS_DIR, username)
+
+
+def enroll_user(username: str, images: list[bytes], replace: bool = False) -> dict:
+    """
+    Embed uploaded JPEG/PNG images in one ArcFace batch, save them under
+    data/users/<username>, and swap the result into the live gallery.
+    replace=True drops the user's previous images and embeddings first.
+    Raises ValueError if the name is invalid or no image contains a face.
+    """
+    user_path = _user_path(username)
+    frames = [cv2.imdecode(np.frombuffer(b, dtype=np.uint8), cv2.IMREAD_COLOR) for b in images]
+    found = [_top_face(f) if f is not None else None for f in frames]
+    hits = [i for i, face in enumerate(found) if face is not None]
+    if not hits:
+        raise ValueError("No face found in any uploaded image")
+    feats = _embed_faces([frames[i] for i in hits], [found[i][1] for i in hits])
+    feats = feats / (np.linalg.norm(feats, axis=1, keepdims=True) + 1e-8)
+
+    gallery = get_gallery()
+    with _enroll_lock:
+        if replace and os.path.isdir(user_path):
+            shutil.rmtree(user_path)
+        os.makedirs(user_path, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        saved = {}
+        for n, i in enumerate(hits):
+            filename = f"{stamp}-{uuid.uuid4().hex}.jpg"   # unique even for uploads in the same second
+            cv2.imwrite(os.path.join(user_path, filename), frames[i])
+            saved[filename] = feats[n]
+        embedding_cache.store_embeddings(user_path, saved, MODEL_NAME)
+        if replace:
+            gallery.replace(username, feats)
+        else:
+            gallery.add(username, feats)
+
+    Thread(target=refresh_index, daemon=True).start()
+    print(f"[DETECTION] Enrolled {username}: {len(hits)}/{len(images)} images with a face")
+    return {"user": username, "embedded": len(hits), "rejected": len(images) - len(hits)}
+
+
+def delete_user(username: str) -> bool:
+    """Remove a user from the live gallery and from disk. False if unknown."""
+    user_path = _user_path(username)
+    gallery = get_gallery()
+    with _enroll_lock:
+        removed = gallery.remove(username)
+        if os.path.isdir(user_path):
+            shutil.rmtree(user_path)
+            removed = True
+    if removed:
+        Thread(target=refresh_index, daemon=True).start()
+        print(f"[DETECTION] Deleted {username}")
+    return removed
+
+
+def list_users() -> list[str]:
+    return sorted(get_gallery().users())
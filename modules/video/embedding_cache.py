@@ -0,0 +1,101 @@
+import os
+import json
+import numpy as np
+
+MANIFEST_NAME = ".embeddings.json"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def _is_image(filename: str) -> bool:
+    return filename.lower().endswith(IMAGE_EXTS)
+
+
+def _stamp(path: str, model_name: str) -> dict:
+    st = os.stat(path)
+    return {"mtime": st.st_mtime_ns, "size": st.st_size, "model": model_name}
+
+
+def _read_manifest(user_path: str) -> dict:
+    try:
+        with open(os.path.join(user_path, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(user_path: str, manifest: dict) -> None:
+    tmp = os.path.join(user_path, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(user_path, MANIFEST_NAME))
+
+
+def load_user_embeddings(user_path: str, embed_image, model_name: str):
+    """
+    Return (embeddings, n_embedded) for every enrollment image in `user_path`.
+
+    Each image's embedding is cached next to it as `<image>.npy` (the layout
+    `recognition_utils.load_user_embeddings` reads). A `.embeddings.json`
+    manifest keys each entry by mtime, size and model name, so only new or
+    changed images go through `embed_image(path) -> np.ndarray | None`.
+    Images with no detectable face are remembered too, so they are not retried.
+    """
+    manifest = _read_manifest(user_path)
+    fresh = {}
+    embs = []
+    n_embedded = 0
+
+    for f in sorted(os.listdir(user_path)):
+        img_path = os.path.join(user_path, f)
+        if not _is_image(f) or not os.path.isfile(img_path):
+            continue
+        stamp = _stamp(img_path, model_name)
+        npy_path = img_path + ".npy"
+        entry = manifest.get(f)
+
+        emb = None
+        if entry and {k: entry.get(k) for k in stamp} == stamp:
+            if not entry.get("face"):
+                fresh[f] = entry
+                continue
+            try:
+                emb = np.load(npy_path)
+            except (OSError, ValueError):
+                emb = None
+
+        if emb is None:
+            emb = embed_image(img_path)
+            n_embedded += 1
+            if emb is not None:
+                emb = np.asarray(emb, dtype=np.float32)
+                np.save(npy_path, emb)
+            elif os.path.exists(npy_path):
+                os.remove(npy_path)
+
+        fresh[f] = {**stamp, "face": emb is not None}
+        if emb is not None:
+            embs.append(emb)
+
+    # Forget images that were deleted since the last run.
+    for f in set(manifest) - set(fresh):
+        stale = os.path.join(user_path, f + ".npy")
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    if fresh != manifest:
+        _write_manifest(user_path, fresh)
+    return embs, n_embedded
+
+
+def store_embeddings(user_path: str, embeddings: dict, model_name: str) -> None:
+    """
+    Record embeddings computed elsewhere (e.g. at enrollment) as
+    {image filename: embedding or None}, so the next startup reuses them.
+    """
+    manifest = _read_manifest(user_path)
+    for filename, emb in embeddings.items():
+        img_path = os.path.join(user_path, filename)
+        if emb is not None:
+            np.save(img_path + ".npy", np.asarray(emb, dtype=np.float32))
+        manifest[filename] = {**_stamp(img_path, model_name), "face": emb is not None}
+    _write_manifest(user_path, manifest)
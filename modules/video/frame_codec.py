@@ -0,0 +1,76 @@
+import os
+import base64
+import cv2
+import numpy as np
+
+# "auto" picks the largest JPEG DCT downscale (1/2, 1/4, 1/8) that still
+# covers the detector input; or force "1", "2", "4" or "8".
+FRAME_DECODE_SCALE = os.getenv("FRAME_DECODE_SCALE", "auto")
+
+_REDUCED_MODES = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+if FRAME_DECODE_SCALE != "auto" and FRAME_DECODE_SCALE not in {str(k) for k in _REDUCED_MODES}:
+    # Checked here: a bad value inside decode_frame would silently turn every frame into None.
+    raise ValueError(f"FRAME_DECODE_SCALE must be auto, 1, 2, 4 or 8, got {FRAME_DECODE_SCALE!r}")
+# SOFn markers carry the frame size (C4 = DHT, C8 = JPG, CC = DAC are not SOF).
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data) -> tuple[int, int] | None:
+    """Read (width, height) from a JPEG header without decoding, or None."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i, n = 2, len(data)
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:                       # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            i += 2                               # standalone markers, no length
+            continue
+        seg_len = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS and i + 9 <= n:
+            h = (data[i + 5] << 8) | data[i + 6]
+            w = (data[i + 7] << 8) | data[i + 8]
+            return w, h
+        i += 2 + seg_len
+    return None
+
+
+def pick_scale(size, target: int, scale: str = FRAME_DECODE_SCALE) -> int:
+    """Downscale factor for a (w, h) frame so its long side stays >= target."""
+    if scale != "auto":
+        return int(scale) if int(scale) in _REDUCED_MODES else 1
+    if size is None:
+        return 1
+    long_side = max(size)
+    for factor in (8, 4, 2):
+        if long_side // factor >= target:
+            return factor
+    return 1
+
+
+def decode_frame(payload, target: int = 640, scale: str = FRAME_DECODE_SCALE):
+    """
+    Decode one /video-stream message into a BGR frame, or None if unreadable.
+
+    payload: raw JPEG bytes (binary message) or base64 text (legacy clients).
+    target: detector input side; the JPEG is downsampled while decoding when
+    it is comfortably larger, which skips most of the IDCT and allocation.
+    """
+    try:
+        if isinstance(payload, str):
+            payload = base64.b64decode(payload)
+        buf = np.frombuffer(payload, dtype=np.uint8)
+        factor = pick_scale(jpeg_size(payload), target, scale)
+        return cv2.imdecode(buf, _REDUCED_MODES[factor])
+    except Exception:
+        return None
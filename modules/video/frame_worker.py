@@ -0,0 +1,116 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded pool shared by every /video-stream connection, so decode + ArcFace
+# never run on the event loop and never exceed this many frames at once.
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", "2"))
+# Frames from all connections arriving within this window are inferred together.
+BATCH_WINDOW_MS = float(os.getenv("VIDEO_BATCH_WINDOW_MS", "20"))
+BATCH_MAX_SIZE = int(os.getenv("VIDEO_BATCH_MAX_SIZE", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=VIDEO_WORKERS, thread_name_prefix="video")
+
+
+async def run_in_pool(fn, *args):
+    """Run a blocking frame job on the video pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, fn, *args)
+
+
+class LatestFrameSlot:
+    """
+    Single-item mailbox for one connection: latest frame wins.
+
+    `put` never blocks; a frame that is still waiting when a newer one
+    arrives is dropped instead of queued, so a slow CPU falls behind by
+    at most one frame rather than building a backlog.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._has_item = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, item) -> None:
+        self.received += 1
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self._has_item.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._has_item.set()
+
+    async def get(self):
+        """Wait for the next pending frame; returns None once closed."""
+        while True:
+            if self._item is not None:
+                item, self._item = self._item, None
+                self._has_item.clear()
+                return item
+            if self._closed:
+                return None
+            await self._has_item.wait()
+            self._has_item.clear()
+
+
+class BatchScheduler:
+    """
+    Collects frames from every active session for a short window and runs
+    them through `process_batch(payloads, sessions) -> [result, ...]` as one
+    job on the video pool. Each `submit` resolves to that frame's result.
+
+    Combined with one LatestFrameSlot per connection, a batch holds at most
+    one frame per session.
+    """
+
+    def __init__(self, process_batch, window_ms: float = BATCH_WINDOW_MS,
+                 max_batch: int = BATCH_MAX_SIZE):
+        self._process_batch = process_batch
+        self._window = window_ms / 1000.0
+        self._max_batch = max_batch
+        self._pending = []        # (session, payload, future)
+        self._timer = None
+        self._running = set()
+        self.batches = 0
+        self.frames = 0
+
+    def submit(self, session, payload) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((session, payload, fut))
+        if len(self._pending) >= self._max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window, self._flush)
+        return fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch) -> None:
+        sessions = [s for s, _, _ in batch]
+        payloads = [p for _, p, _ in batch]
+        self.batches += 1
+        self.frames += len(batch)
+        try:
+            results = await run_in_pool(self._process_batch, payloads, sessions)
+        except Exception as e:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, _, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
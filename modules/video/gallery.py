@@ -0,0 +1,215 @@
+import os
+import hashlib
+import numpy as np
+from threading import Lock
+
+from modules.video.ann_index import IVFIndex
+
+# Below this many rows an exact scan is faster than any ANN index.
+ANN_MIN_ROWS = int(os.getenv("FACE_ANN_MIN_ROWS", "5000"))
+
+
+def _normalize_rows(embs) -> np.ndarray:
+    """Stack embeddings into an (N, D) float32 matrix with unit-length rows."""
+    mat = np.atleast_2d(np.asarray(embs, dtype=np.float32))
+    norms = np.linalg.norm(mat, axis=1, keepdims=True) + 1e-8
+    return np.ascontiguousarray(mat / norms, dtype=np.float32)
+
+
+class FaceGallery:
+    """
+    All reference face embeddings in one contiguous float32 matrix.
+
+    Row i belongs to the user at `_owners[i]`. A probe is scored against the
+    whole gallery with a single matrix product and reduced to the best score
+    per user. Adding rows writes into spare capacity; removing a user builds
+    new arrays and swaps them in, so readers never see a half-updated gallery.
+
+    Large galleries can attach an IVFIndex; it is only consulted while it
+    still matches the gallery contents, otherwise matching stays exact.
+    """
+
+    def __init__(self, dim: int = 512, capacity: int = 64, ann_min_rows: int = ANN_MIN_ROWS):
+        self.dim = dim
+        self._lock = Lock()
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._owners = np.zeros(capacity, dtype=np.int32)
+        self._size = 0
+        self._names = []          # user id -> name (None for freed slots)
+        self._ids = {}            # name -> user id
+        self._free_ids = []
+        self._version = 0         # bumped on every mutation
+        self._ann = None          # (IVFIndex, version it was built for)
+        self.ann_min_rows = ann_min_rows
+
+    @classmethod
+    def from_dict(cls, user_embeddings: dict, dim: int | None = None) -> "FaceGallery":
+        """Build a gallery from {username: embedding or [embeddings]}."""
+        if dim is None:
+            first = next(iter(user_embeddings.values()), None)
+            dim = np.atleast_2d(np.asarray(first)).shape[1] if first is not None else 512
+        gallery = cls(dim=dim)
+        for user, embs in user_embeddings.items():
+            gallery.add(user, embs)
+        return gallery
+
+    # Mutation
+    def _user_id(self, user: str) -> int:
+        uid = self._ids.get(user)
+        if uid is None:
+            if self._free_ids:
+                uid = self._free_ids.pop()
+                self._names[uid] = user
+            else:
+                uid = len(self._names)
+                self._names.append(user)
+            self._ids[user] = uid
+        return uid
+
+    def add(self, user: str, embeddings) -> None:
+        """Append one or more reference embeddings for `user`."""
+        rows = self._check_rows(embeddings)
+        with self._lock:
+            self._add_locked(user, rows)
+
+    def _check_rows(self, embeddings) -> np.ndarray:
+        rows = _normalize_rows(embeddings)
+        if rows.size and rows.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim embeddings, got {rows.shape[1]}")
+        return rows
+
+    def _add_locked(self, user: str, rows: np.ndarray) -> None:
+        if rows.size == 0:
+            return
+        uid = self._user_id(user)
+        n, k = self._size, rows.shape[0]
+        if n + k > self._matrix.shape[0]:
+            cap = max(n + k, 2 * self._matrix.shape[0])
+            matrix = np.zeros((cap, self.dim), dtype=np.float32)
+            owners = np.zeros(cap, dtype=np.int32)
+            matrix[:n] = self._matrix[:n]
+            owners[:n] = self._owners[:n]
+            self._matrix, self._owners = matrix, owners
+        self._matrix[n:n + k] = rows
+        self._owners[n:n + k] = uid
+        self._size = n + k
+        self._version += 1
+
+    def remove(self, user: str) -> bool:
+        """Drop every reference embedding of `user`. Returns False if unknown."""
+        with self._lock:
+            return self._remove_locked(user)
+
+    def _remove_locked(self, user: str) -> bool:
+        uid = self._ids.pop(user, None)
+        if uid is None:
+            return False
+        keep = self._owners[:self._size] != uid
+        matrix = np.zeros_like(self._matrix)
+        owners = np.zeros_like(self._owners)
+        n = int(keep.sum())
+        matrix[:n] = self._matrix[:self._size][keep]
+        owners[:n] = self._owners[:self._size][keep]
+        self._matrix, self._owners, self._size = matrix, owners, n
+        self._version += 1
+        self._names[uid] = None
+        self._free_ids.append(uid)
+        return True
+
+    def replace(self, user: str, embeddings) -> None:
+        """Atomically swap all of `user`'s embeddings for a new set."""
+        rows = self._check_rows(embeddings)
+        with self._lock:
+            self._remove_locked(user)
+            self._add_locked(user, rows)
+
+    # ANN index
+    def fingerprint(self) -> str:
+        """
+        Content hash of rows + owners, used to tell if a saved index is
+        current. Rows are hashed sorted by (owner, bytes): a restart loads
+        users in directory order, not in the order they were enrolled.
+        """
+        matrix, owners, names = self._snapshot()
+        rows = sorted((names[o], row.tobytes()) for o, row in zip(owners, matrix))
+        h = hashlib.sha1()
+        for name, row in rows:
+            h.update(name.encode() + b"\0")
+            h.update(row)
+        return h.hexdigest()
+
+    def build_index(self, nlist: int | None = None) -> IVFIndex:
+        """Build an IVFIndex over the current rows and attach it."""
+        with self._lock:
+            version = self._version
+        matrix, owners, names = self._snapshot()
+        index = IVFIndex.build(matrix, owners, names, nlist=nlist, fingerprint=self.fingerprint())
+        with self._lock:
+            if self._version == version:
+                self._ann = (index, version)
+        return index
+
+    def attach_index(self, index: IVFIndex | None) -> bool:
+        """Use a (typically memory-mapped) saved index if it matches these rows."""
+        if index is None or index.fingerprint != self.fingerprint():
+            return False
+        with self._lock:
+            self._ann = (index, self._version)
+        return True
+
+    def index_is_current(self) -> bool:
+        with self._lock:
+            return self._ann is not None and self._ann[1] == self._version
+
+    # Queries
+    def _snapshot(self):
+        with self._lock:
+            n = self._size
+            return self._matrix[:n], self._owners[:n], list(self._names)
+
+    def _current_ann(self):
+        with self._lock:
+            if self._ann is None or self._ann[1] != self._version or self._size < self.ann_min_rows:
+                return None
+            return self._ann[0]
+
+    def users(self) -> list[str]:
+        with self._lock:
+            return list(self._ids)
+
+    def __contains__(self, user) -> bool:
+        return user in self._ids
+
+    def __len__(self) -> int:
+        return self._size
+
+    def scores(self, probe: np.ndarray) -> dict[str, float]:
+        """Best cosine similarity of `probe` against each user."""
+        matrix, owners, names = self._snapshot()
+        if not len(matrix):
+            return {}
+        sims = matrix @ _normalize_rows(probe)[0]
+        best = np.full(len(names), -np.inf, dtype=np.float32)
+        np.maximum.at(best, owners, sims)
+        return {names[i]: float(best[i]) for i in np.flatnonzero(best > -np.inf)}
+
+    def match_many(self, probes: np.ndarray, threshold: float) -> list[tuple[str | None, float]]:
+        """Best (username or None, score) for each row of `probes`."""
+        probes = _normalize_rows(probes)
+        ann = self._current_ann()
+        if ann is not None:
+            return ann.match_many(probes, threshold)
+        matrix, owners, names = self._snapshot()
+        if not len(matrix):
+            return [(None, 0.0)] * len(probes)
+        sims = probes @ matrix.T                      # (P, N)
+        rows = sims.argmax(axis=1)
+        best = sims[np.arange(len(probes)), rows]
+        return [
+            (names[owners[r]] if s >= threshold else None, float(s))
+            for r, s in zip(rows, best)
+        ]
+
+    def match(self, probe: np.ndarray, threshold: float) -> tuple[str | None, float]:
+        """Best (username or None, score) for a single probe."""
+        return self.match_many(probe, threshold)[0]
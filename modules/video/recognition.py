@@ -1,24 +1,23 @@
 import os
 import numpy as np
-from numpy.linalg import norm
+
+from modules.video.gallery import FaceGallery
+
 
 def load_user_embeddings(folder="data/users"):
-    user_embeddings = {}
+    """Load one `<username>.npy` embedding per user into a FaceGallery."""
+    gallery = None
     for file in os.listdir(folder):
         if file.endswith(".npy"):
             username = os.path.splitext(file)[0]
             emb = np.load(os.path.join(folder, file))
-            user_embeddings[username] = emb
-    return user_embeddings
+            if gallery is None:
+                gallery = FaceGallery(dim=emb.shape[-1])
+            gallery.add(username, emb)
+    return gallery if gallery is not None else FaceGallery()
 
 def recognize_face(embedding, user_embeddings, threshold=0.5):
-    max_sim = -1
-    identity = "Unknown"
-    for username, user_emb in user_embeddings.items():
-        sim = np.dot(embedding, user_emb) / (norm(embedding) * norm(user_emb))
-        if sim > max_sim:
-            max_sim = sim
-            identity = username
-    if max_sim < threshold:
-        identity = "Unknown"
-    return identity
+    if not isinstance(user_embeddings, FaceGallery):
+        user_embeddings = FaceGallery.from_dict(user_embeddings)
+    identity, _ = user_embeddings.match(embedding, threshold)
+    return identity or "Unknown"
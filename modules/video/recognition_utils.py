@@ -1,17 +1,16 @@
 import os
 import numpy as np
-from numpy.linalg import norm
+
+from modules.video.gallery import FaceGallery
+
 
 def load_user_embeddings(folder="data/users"):
     """
     Load all embeddings for all users.
-    Returns a dictionary:
-    {
-        username: [embedding1, embedding2, ...],
-        ...
-    }
+    Returns a FaceGallery holding every `<folder>/<username>/*.npy`
+    embedding as one row, indexed back to its username.
     """
-    user_embeddings = {}
+    gallery = None
     for username in os.listdir(folder):
         user_folder = os.path.join(folder, username)
         if os.path.isdir(user_folder):
@@ -21,25 +20,18 @@ def load_user_embeddings(folder="data/users"):
                     emb = np.load(os.path.join(user_folder, file))
                     embeddings.append(emb)
             if embeddings:
-                user_embeddings[username] = embeddings
-    return user_embeddings
+                if gallery is None:
+                    gallery = FaceGallery(dim=embeddings[0].shape[-1])
+                gallery.add(username, embeddings)
+    return gallery if gallery is not None else FaceGallery()
 
 def recognize_face(embedding, user_embeddings, threshold=0.3):
     """
     Compare live embedding against all stored embeddings for all users.
+    `user_embeddings` is a FaceGallery (or a {username: [embeddings]} dict).
     Returns the matched username or 'Unknown'.
     """
-    max_sim = -1
-    identity = "Unknown"
-
-    for username, embeddings_list in user_embeddings.items():
-        for user_emb in embeddings_list:
-            sim = np.dot(embedding, user_emb) / (norm(embedding) * norm(user_emb))
-            if sim > max_sim:
-                max_sim = sim
-                identity = username
-
-    if max_sim < threshold:
-        identity = "Unknown"
-
-    return identity
+    if not isinstance(user_embeddings, FaceGallery):
+        user_embeddings = FaceGallery.from_dict(user_embeddings)
+    identity, _ = user_embeddings.match(embedding, threshold)
+    return identity or "Unknown"
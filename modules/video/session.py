@@ -0,0 +1,85 @@
+import time
+from threading import Lock
+
+
+def box_iou(a, b) -> float:
+    """Intersection-over-union of two (x1, y1, x2, y2[, score]) boxes."""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+class RecognitionSession:
+    """
+    Presence/idle state for one video stream (one WebSocket connection).
+
+    Holds what `detection.py` used to keep in module globals, so several
+    kiosks or browser tabs no longer overwrite each other's user.
+    """
+
+    def __init__(self, idle_seconds: float = 7, lock=None):
+        self.idle_seconds = idle_seconds
+        self.lock = lock or Lock()
+        self.current_user = None
+        self.system_active = False
+        self.last_seen = 0.0
+        # Detect-then-track: last recognized face box and who it was.
+        self.track_box = None
+        self.track_user = None
+        self.frames_since_recognition = 0
+
+    def update(self, face_found: bool, recognized: str | None, now: float | None = None):
+        """Fold one frame's result into the session and return (user, active)."""
+        now = time.time() if now is None else now
+        with self.lock:
+            if face_found:
+                if recognized:
+                    print(f"[DEBUG] Recognized user: {recognized}")
+                else:
+                    print("[DEBUG] Unknown face detected")
+                self.last_seen = now
+                self.current_user = recognized
+                self.system_active = True
+            elif self.system_active and now - self.last_seen > self.idle_seconds:
+                self.current_user = None
+                self.system_active = False
+                print("[DEBUG] No face for a while → system idle")
+            return self.current_user, self.system_active
+
+    def needs_recognition(self, box, every_n: int, min_iou: float) -> bool:
+        """
+        True when this frame should go through ArcFace: no track yet, the
+        track is `every_n` frames old, or the face box moved (IoU < min_iou).
+        Otherwise the tracked identity is carried forward.
+        """
+        with self.lock:
+            if self.track_box is None or self.frames_since_recognition + 1 >= every_n:
+                return True
+            return box_iou(box, self.track_box) < min_iou
+
+    def track(self, box, user: str | None, recognized: bool) -> str | None:
+        """
+        Advance the track by one frame; returns the identity to report.
+        The box is only stored when the face was recognized, so a slow drift
+        still trips the IoU check against where it was last identified.
+        """
+        with self.lock:
+            if recognized:
+                self.track_user = user
+                self.track_box = box
+                self.frames_since_recognition = 0
+            else:
+                self.frames_since_recognition += 1
+            return self.track_user
+
+    def reset_track(self) -> None:
+        with self.lock:
+            self.track_box = None
+            self.track_user = None
+            self.frames_since_recognition = 0
+
+    def state(self):
+        with self.lock:
+            return self.current_user, self.system_active
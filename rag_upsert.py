@@ -1,20 +1,47 @@
+"""
+Bulk-load documents into the vector store.
+
+python rag_upsert.py data/history/*.jsonl notes.md --checkpoint data/ingest.ckpt.json
+Streams .jsonl / .txt / .md files, chunks them, embeds in batches and
+upserts with bounded concurrency. Re-running with the same checkpoint
+resumes after the last batch that was fully written.
+"""
 import os
-from pinecone import Pinecone
-from modules.rag.embeddings import embed_text
+import argparse
+
+from dotenv import load_dotenv
+load_dotenv()
+from modules.rag import ingest
+from modules.rag.embeddings import DIM, embed_texts
+from modules.rag.vector_store import make_store
+
 
-pc = Pinecone(api_key="pcsk_5m4ABP_DopP7v9TWusvzEFKpNwNn3P6hXASBXfiXcbuDuXb7QNAC6MZNu26BSfbEFoZjA8")
-index = pc.Index("chatbot")  # your Pinecone index name  # your index name
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+", help=".jsonl, .txt (one document per line) or .md files")
+    parser.add_argument("--checkpoint", default="data/ingest.ckpt.json", help="progress file ('' = none)")
+    parser.add_argument("--index", default=os.getenv("PINECONE_INDEX", "video-chatbot"))
+    parser.add_argument("--namespace", default="", help="partition to write into")
+    parser.add_argument("--namespace-field", default=None,
+                        help="JSONL field holding the partition, e.g. user (memories are per user)")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the text")
+    parser.add_argument("--batch-size", type=int, default=ingest.INGEST_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=ingest.INGEST_WORKERS, help="concurrent upserts")
+    args = parser.parse_args()
 
-docs = [
-    "Harshita said she likes watching movies on weekends.",
-    "Harshita enjoys coding in Python.",
-    "Harshita recently started learning about RAG systems.",
-]
+    if args.checkpoint:
+        os.makedirs(os.path.dirname(args.checkpoint) or ".", exist_ok=True)
+    store = make_store(DIM, index_name=args.index)    # VECTOR_STORE=pinecone|local
+    result = ingest.ingest(
+        args.paths, store,
+        lambda texts: embed_texts(texts, cache=False),
+        ingest.Checkpoint(args.checkpoint),
+        namespace=args.namespace, namespace_field=args.namespace_field,
+        text_field=args.text_field, batch_size=args.batch_size, workers=args.workers,
+    )
+    print(f"✅ Inserted {result['chunks']} chunks from {result['docs']} documents "
+          f"in {result['seconds']:.1f}s ({result['chunks_per_s']:.0f} chunks/s)")
 
-vectors = []
-for i, doc in enumerate(docs):
-    vec = embed_text(doc)
-    vectors.append((f"doc-{i}", vec, {"text": doc}))
 
-index.upsert(vectors)
-print("✅ Inserted", len(docs), "vectors into Pinecone")
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,148 @@
 import os
+import atexit
+import hashlib
 import logging
+import numpy as np
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
-load_dotenv()
+load_dotenv()  # before the modules below read their settings
+from modules.rag import embeddings
+from modules.rag.embedding_cache import default_cache as embedding_cache
+from modules.rag.vector_store import make_store
+from modules.rag.memory_writer import MemoryWriter
+from modules.rag.query_cache import QueryCache
+from modules.utils.registry import components
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("rag_utils")
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX", "video-chatbot")
-EMBED_MODEL_NAME = "all-MiniLM-L6-v2"   # ✅ 384 dimensions
-
-if not PINECONE_API_KEY:
-    raise ValueError("❌ Missing PINECONE_API_KEY in environment.")
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-logger.info(f"🧠 Loading embedding model: {EMBED_MODEL_NAME}")
-embedder = SentenceTransformer(EMBED_MODEL_NAME)
-
-DIM = embedder.get_sentence_embedding_dimension()  # should be 384
-try:
-    if INDEX_NAME not in [i["name"] for i in pc.list_indexes()]:
-        logger.info(f"📦 Creating Pinecone index '{INDEX_NAME}' (dim={DIM})...")
-        pc.create_index(
-            name=INDEX_NAME,
-            spec=ServerlessSpec(
-                cloud="aws",
-                region="us-east-1",
-                dimension=DIM,
-                metric="cosine"
-            )
-        )
-    logger.info(f"🔗 Connected to Pinecone index: {INDEX_NAME}")
-except Exception as e:
-    logger.error(f"❌ Error ensuring Pinecone index: {e}")
-    raise
-
-# Index handle
-index = pc.Index(INDEX_NAME)
+EMBED_MODEL_NAME = embeddings.MODEL_NAME   # ✅ 384 dimensions (native, no padding)
+WRITE_BEHIND = os.getenv("MEMORY_WRITE_BEHIND", "1") == "1"            # batch upserts off the request path
+READ_YOUR_WRITES = os.getenv("MEMORY_READ_YOUR_WRITES", "1") == "1"    # queries also see queued writes
+
+embed_batcher = embeddings.batcher
+DIM = embeddings.DIM  # should be 384
+
+
+def _open_store():
+    # VECTOR_STORE=pinecone (default) or local (in-process, persisted under LOCAL_STORE_DIR)
+    return make_store(DIM, index_name=INDEX_NAME)
+
+# Connected on first use (or by components.warmup()), not at import.
+components.register("vector_store", _open_store)
+
+
+def get_index():
+    """The memory vector store, opened once on first use."""
+    return components.get("vector_store")
+
 
 def get_embedding(text: str):
-    """Convert text to vector embedding (384-dim)."""
-    return embedder.encode(text).tolist()
+    """
+    Convert text to vector embedding (384-dim list). Served from the LRU cache
+    when seen before; otherwise encoded in a micro-batch with concurrent callers.
+    Internal callers use embeddings.embed_array and skip the list conversion.
+    """
+    return embeddings.embed_array(text).tolist()
+
+
+def get_embeddings(texts: list[str]) -> np.ndarray:
+    """Batch form: (N, 384) float32 array, cache hits skip the model."""
+    return embeddings.embed_arrays(texts)
+
+
+# Retrieval results per (partition, query, top_k); a write drops the ones it could change.
+query_cache = QueryCache()
 
 
-def upsert_memory(user_id: str, text: str):
-    """Store message in Pinecone."""
+def _store_upsert(items, namespace: str = ""):
+    items = list(items)
     try:
-        vector = get_embedding(text)
-        index.upsert([
-            (f"{user_id}-{hash(text)}", vector, {"text": text})
-        ])
+        get_index().upsert(items, namespace=namespace)
+    finally:
+        query_cache.invalidate(namespace, items)
+
+
+memory_writer = MemoryWriter(get_embeddings, _store_upsert)
+atexit.register(memory_writer.close)
+
+
+def memory_namespace(user_id: str | None) -> str:
+    """Each user's memories (and the bot's replies to them) live in their own partition."""
+    return user_id or ""
+
+
+def memory_id(role: str, text: str) -> str:
+    """Content-addressed ID, stable across processes (unlike the salted built-in hash)."""
+    digest = hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:32]
+    return f"{role}-{digest}"
+
+
+def upsert_memory(user_id: str, text: str, role: str = "user", wait: bool = not WRITE_BEHIND):
+    """
+    Store message in the user's partition of the vector store. Re-upserting
+    the same text is idempotent. By default it is queued and written in a
+    bulk upsert by the background writer; wait=True writes it now.
+    """
+    namespace = memory_namespace(user_id)
+    entry = {"id": memory_id(role, text), "user_id": user_id, "namespace": namespace,
+             "text": text, "metadata": {"text": text, "role": role, "user": user_id}}
+    if not wait:
+        # Read-your-writes queries see it while queued, so cached results may change now.
+        vector = embeddings.embed_array(text) if query_cache.has(namespace) else None
+        memory_writer.enqueue(entry)
+        query_cache.invalidate(namespace, None if vector is None else [(entry["id"], vector)])
+        return
+    try:
+        vector = embeddings.embed_array(text)
+        _store_upsert([(entry["id"], vector, entry["metadata"])], namespace=namespace)
         logger.info(f"✅ Upserted message for user={user_id}")
     except Exception as e:
-        logger.error(f"❌ Pinecone upsert failed: {e}")
+        logger.error(f"❌ Vector store upsert failed: {e}")
+
+
+def _pending_matches(vector, user_id: str | None) -> list[dict]:
+    """Score the partition's queued-but-unflushed memories locally (read-your-writes)."""
+    namespace = memory_namespace(user_id)
+    pending = [e for e in memory_writer.pending() if e["namespace"] == namespace]
+    if not pending:
+        return []
+    sims = get_embeddings([e["text"] for e in pending]) @ vector   # unit vectors
+    return [
+        {"id": e["id"], "score": float(s), "metadata": e["metadata"]}
+        for e, s in zip(pending, sims)
+    ]
 
 
-def query_memory(query: str, top_k: int = 3):
-    """Retrieve top_k relevant messages from Pinecone."""
+def query_memory(query: str, top_k: int = 3, user_id: str | None = None,
+                 read_your_writes: bool = READ_YOUR_WRITES):
+    """
+    Retrieve top_k relevant messages from `user_id`'s partition only. With
+    read_your_writes, that user's memories still in the write-behind queue
+    are merged into the results. Repeated queries are served from
+    query_cache until a write to the partition could change them or
+    QUERY_CACHE_TTL passes.
+    """
+    namespace = memory_namespace(user_id)
+    use_cache = read_your_writes == READ_YOUR_WRITES    # cached results assume the default
+    cached = query_cache.get(namespace, query, top_k) if use_cache else None
+    if cached is not None:
+        return cached
+    generation = query_cache.generation(namespace)
     try:
-        vector = get_embedding(query)
-        res = index.query(vector=vector, top_k=top_k, include_metadata=True)
+        vector = embeddings.embed_array(query)
+        res = get_index().query(vector=vector, top_k=top_k, include_metadata=True,
+                                namespace=namespace)
+        if read_your_writes:
+            extra = _pending_matches(vector, user_id)
+            if extra:
+                seen = {m["id"] for m in res.get("matches", [])}
+                matches = list(res.get("matches", [])) + [m for m in extra if m["id"] not in seen]
+                matches.sort(key=lambda m: m["score"], reverse=True)
+                res = {"matches": matches[:top_k]}
         logger.info(f"🔍 Query results: {len(res.get('matches', []))} matches")
+        if use_cache:
+            query_cache.put(namespace, query, top_k, res, generation, vector)
         return res
     except Exception as e:
-        logger.error(f"❌ Pinecone query failed: {e}")
+        logger.error(f"❌ Vector store query failed: {e}")
         return {"matches": []}
@@ -1,21 +1,34 @@
 import os
-import cv2
-import base64
-import numpy as np
-import requests
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import json
+import time
+import asyncio
+from typing import Literal
+from fastapi import FastAPI, File, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 # Local modules
-from rag_utils import upsert_memory, query_memory
+from rag_utils import (upsert_memory, query_memory, embedding_cache, embed_batcher,
+                       memory_writer, query_cache)
 from modules.video import detection  # face recognition module
+from modules.video.frame_codec import decode_frame
+from modules.video.frame_worker import BatchScheduler, LatestFrameSlot, run_in_pool
+from modules.utils.registry import components
+from modules.nlp.llm_client import LLMError, llm
+from modules.nlp.llm_scheduler import QueueFull
+from modules.nlp.response_cache import ResponseCache, context_facts, context_fingerprint
+from modules.rag.embeddings import embed_array
+from modules.nlp.chat_sessions import LLM_KEEP_ALIVE, ChatSessions
 
 
 load_dotenv()
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
-OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")  # change if you want
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")  # change if you want (OLLAMA_URL: see llm_client)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"  # load models in the background at startup
+CHAT_CONTEXT_K = int(os.getenv("CHAT_CONTEXT_K", "3"))            # memories put in the prompt
+CHAT_CONTEXT_EXTRA = int(os.getenv("CHAT_CONTEXT_EXTRA", "3"))    # retrieved on top for the response_cache fingerprint
 
 app = FastAPI()
 
@@ -27,10 +40,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _warmup():
+    """Load every registered component in parallel, then run one dummy frame."""
+    components.warmup()
+    if components.loaded("face_models"):
+        detection.warmup()
+
+@app.on_event("startup")
+async def start_warmup():
+    """Accept connections right away; /ready turns 200 once everything is loaded."""
+    memory_writer.start()    # no-op on first start; restarts it if an earlier shutdown closed it
+    if WARMUP_ON_STARTUP:
+        asyncio.get_running_loop().run_in_executor(None, _warmup)
+
+@app.on_event("shutdown")
+async def flush_memories():
+    """Write any queued memories before the process exits."""
+    memory_writer.close()
+    await llm.aclose()
+
 @app.get("/health")
 async def health():
+    """Liveness: the process is up and serving (models may still be loading)."""
     return {"ok": True}
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once every required component is loaded, else 503."""
+    is_ready = components.ready()
+    return JSONResponse(status_code=200 if is_ready else 503,
+                        content={"ready": is_ready, "components": components.status()})
+
+@app.get("/stats")
+async def stats():
+    """Cache counters, to see how much model time is being saved."""
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batcher": embed_batcher.stats(),
+        "memory_writer": memory_writer.stats(),
+        "query_cache": query_cache.stats(),
+        "llm_sessions": chat_sessions.stats(),
+        "llm_scheduler": llm.scheduler.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
 @app.get("/")
 async def root():
     return {"message": "🚀 Video + RAG Chatbot Server running"}
@@ -39,102 +92,330 @@ async def root():
 class ChatRequest(BaseModel):
     text: str
     user: str = "default-user"
+    # "background" for batch/offline callers: queued behind chats and shed first under load.
+    priority: Literal["interactive", "background"] = "interactive"
+
+
+def _build_prompt(user_text: str, context: str) -> str:
+    return (
+        "You are a helpful and context-aware AI assistant.\n"
+        "Below is memory retrieved from past conversations. "
+        "Use this context strictly when answering — do not make things up.\n\n"
+        f"--- MEMORY ---\n{context}\n"
+        "----------------\n\n"
+        f"User: {user_text}\n"
+        "Bot (based only on the memory and conversation history):"
+    )
+
+
+def _build_followup(user_text: str, new_context: str) -> str:
+    """Next turn of a live session: the model already has the instructions and earlier memory."""
+    memory = f"--- NEW MEMORY ---\n{new_context}\n----------------\n\n" if new_context else ""
+    return (
+        f"{memory}User: {user_text}\n"
+        "Bot (based only on the memory and conversation history):"
+    )
+
+
+# Per-user Ollama context, so follow-up turns skip re-processing the whole prompt.
+chat_sessions = ChatSessions()
+
+
+def _llm_turn(user_id: str, user_text: str, context_texts: list[str]):
+    """Prompt + extra Ollama fields for this turn, and the texts the model will have seen."""
+    session = chat_sessions.get(user_id)
+    if session is None:
+        prompt = _build_prompt(user_text, "\n".join(context_texts))
+        fields = {}
+    else:
+        new = [t for t in context_texts if t not in session.shown and t != user_text]
+        prompt = _build_followup(user_text, "\n".join(new))
+        fields = {"context": session.context}
+    return prompt, {**fields, "keep_alive": LLM_KEEP_ALIVE}, [*context_texts, user_text]
+
+
+def _remember_turn(user_id: str, user_text: str, reply: str) -> None:
+    """
+    Store an answered turn (message, then reply) in the user's partition.
+    Blocking (a synchronous write with MEMORY_WRITE_BEHIND=0, and it may
+    embed to update query_cache): run it in a thread.
+    """
+    upsert_memory(user_id, user_text)
+    upsert_memory(user_id, reply, role="bot")
+
+
+async def _retrieve(user_id: str, user_text: str, top_k: int = CHAT_CONTEXT_K) -> tuple[list[str], str]:
+    """
+    Fetch the `top_k` memories closest to the question from the user's
+    partition for the prompt. With response_cache on, a few more are
+    retrieved so its fingerprint can be taken over the top_k facts (no bot
+    replies or paraphrases, see context_facts). Returns the prompt texts and
+    the fingerprint ("" with the cache off).
+    """
+    extra = CHAT_CONTEXT_EXTRA if response_cache.enabled else 0
+    # Off the event loop, so concurrent requests can share embedding batches.
+    context_results = await asyncio.to_thread(query_memory, user_text, top_k + extra, user_id)
+    matches = context_results.get("matches", [])
+    fingerprint = context_fingerprint(context_facts(matches, top_k)) if response_cache.enabled else ""
+    return [m["metadata"]["text"] for m in matches[:top_k]], fingerprint
+
+
+# Optional semantic cache of replies (RESPONSE_CACHE=1), per user + retrieved context.
+response_cache = ResponseCache()
+
+
+async def _cached_reply(user_id: str, user_text: str, fingerprint: str):
+    """(cached reply or None, query embedding to cache a new reply under; None if the cache is off)."""
+    if not response_cache.enabled:
+        return None, None
+    vector = await asyncio.to_thread(embed_array, user_text)   # LRU hit: query_memory embedded it
+    hit = response_cache.get(user_id, fingerprint, vector)
+    return (hit["reply"] if hit else None), vector
+
+
+def _busy(e: QueueFull) -> JSONResponse:
+    """429 with a retry hint when the LLM queue is full."""
+    return JSONResponse(status_code=429, headers={"Retry-After": str(e.retry_after)},
+                        content={"error": "Too many chats in progress, try again shortly.",
+                                 "retry_after": e.retry_after})
+
 
 @app.post("/chat")
 async def chat(req: ChatRequest):
     """
     RAG-powered text chat (no video).
-    - Upserts user message to Pinecone
-    - Retrieves relevant context
-    - Calls Ollama (non-stream) with the context
-    - Upserts bot reply back to Pinecone
+    - Retrieves relevant context from the user's memory partition only
+    - Calls Ollama (non-stream) with the context through the pooled async client
+    - Upserts the user message and bot reply to the same partition
+    Only answered turns are stored: an LLM/backend error is returned as the
+    reply without touching memory, and a full LLM queue answers 429 +
+    Retry-After.
     """
     user_text = (req.text or "").strip()
     user_id = req.user or "default-user"
 
     if not user_text:
         return {"reply": "I didn't receive any input."}
+    try:
+        llm.scheduler.check(req.priority)    # turn a burst away before doing any work
+    except QueueFull as e:
+        return _busy(e)
 
+    context_texts, fingerprint = await _retrieve(user_id, user_text)
+    cached, vector = await _cached_reply(user_id, user_text, fingerprint)
+    if cached is not None:
+        await asyncio.to_thread(_remember_turn, user_id, user_text, cached)
+        return {"reply": cached, "context": context_texts, "cached": True}
+    prompt, fields, shown = _llm_turn(user_id, user_text, context_texts)
 
-    upsert_memory(user_id, user_text)
+    try:
+        data = await llm.generate(prompt, model=OLLAMA_MODEL, priority=req.priority, **fields)
+        llm_reply = (data.get("response") or "").strip()
+        chat_sessions.update(user_id, data.get("context"), [*shown, llm_reply])
+        if not llm_reply:
+            llm_reply = "I couldn't generate a response."
+        elif vector is not None:
+            response_cache.put(user_id, fingerprint, vector, llm_reply)
+    except QueueFull as e:
+        return _busy(e)
+    except LLMError as e:
+        chat_sessions.drop(user_id)
+        return {"reply": f"⚠️ LLM error (HTTP {e.status_code}).", "context": context_texts}
+    except Exception as e:
+        chat_sessions.drop(user_id)
+        return {"reply": f"⚠️ Backend error: {e}", "context": context_texts}
 
-    context_results = query_memory(user_text, top_k=3)
-    context_texts = [m["metadata"]["text"] for m in context_results.get("matches", [])]
-    context = "\n".join(context_texts)
+    await asyncio.to_thread(_remember_turn, user_id, user_text, llm_reply)
+
+    return {"reply": llm_reply, "context": context_texts}
 
-    prompt = (
-        "You are a helpful assistant. Use the context when relevant; "
-        "if it’s not relevant, answer normally.\n\n"
-        f"Context:\n{context}\n\n"
-        f"User: {user_text}\nBot:"
-    )
-    payload = {
-        "model": OLLAMA_MODEL,
-        # "prompt": prompt,
-         "prompt": (
-            "You are a helpful and context-aware AI assistant.\n"
-            "Below is memory retrieved from past conversations. "
-            "Use this context strictly when answering — do not make things up.\n\n"
-            f"--- MEMORY ---\n{context}\n"
-            "----------------\n\n"
-            f"User: {user_text}\n"
-            "Bot (based only on the memory and conversation history):"
-        ),
-        "stream": False,     
-    }
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Same as /chat, streamed as Server-Sent Events:
+    - event "context": {"context": [...]} as soon as retrieval is done
+    - event "token":   {"token": "..."} for every piece Ollama produces
+    - event "done":    {"reply", "model", "ttft_ms", "total_ms", "eval_count", "cached"}
+      (or event "error": {"error": "..."})
+    A response_cache hit is sent as a single token event.
+    The message and full reply are upserted to memory after the stream has
+    closed (nothing is stored for a turn that errored or was turned away).
+    Answers 429 + Retry-After instead when the LLM queue is full.
+    """
+    user_text = (req.text or "").strip()
+    user_id = req.user or "default-user"
     try:
-        resp = requests.post(OLLAMA_URL, json=payload, timeout=120)
-        if resp.status_code == 200:
-            data = resp.json()
-            llm_reply = (data.get("response") or "").strip()
-            if not llm_reply:
-                llm_reply = "I couldn't generate a response."
-        else:
-            llm_reply = f"⚠️ LLM error (HTTP {resp.status_code})."
-    except Exception as e:
-        llm_reply = f"⚠️ Backend error: {e}"
+        llm.scheduler.check(req.priority)
+    except QueueFull as e:
+        return _busy(e)
+    t0 = time.perf_counter()
+    finished = {}
 
- 
-    upsert_memory("bot", llm_reply)
+    async def events():
+        if not user_text:
+            yield _sse("error", {"error": "I didn't receive any input."})
+            return
+        context_texts, fingerprint = await _retrieve(user_id, user_text)
+        yield _sse("context", {"context": context_texts})
+
+        cached, vector = await _cached_reply(user_id, user_text, fingerprint)
+        if cached is not None:
+            finished["reply"] = cached
+            yield _sse("token", {"token": cached})
+            total_ms = round((time.perf_counter() - t0) * 1000, 1)
+            yield _sse("done", {"reply": cached, "model": OLLAMA_MODEL, "ttft_ms": total_ms,
+                                "total_ms": total_ms, "eval_count": 0, "cached": True})
+            return
+
+        prompt, fields, shown = _llm_turn(user_id, user_text, context_texts)
+        parts, ttft, last = [], None, {}
+        try:
+            async for chunk in llm.stream(prompt, model=OLLAMA_MODEL, priority=req.priority, **fields):
+                token = chunk.get("response") or ""
+                if token:
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    parts.append(token)
+                    yield _sse("token", {"token": token})
+                if chunk.get("done"):
+                    last = chunk
+                    break
+        except QueueFull as e:
+            yield _sse("error", {"error": "Too many chats in progress, try again shortly.",
+                                 "retry_after": e.retry_after})
+            return
+        except LLMError as e:
+            chat_sessions.drop(user_id)
+            yield _sse("error", {"error": f"LLM error (HTTP {e.status_code})."})
+            return
+        except Exception as e:
+            chat_sessions.drop(user_id)
+            yield _sse("error", {"error": f"Backend error: {e}"})
+            return
+
+        reply = "".join(parts).strip()
+        chat_sessions.update(user_id, last.get("context"), [*shown, reply])
+        if reply and vector is not None:
+            response_cache.put(user_id, fingerprint, vector, reply)
+        reply = reply or "I couldn't generate a response."
+        finished["reply"] = reply
+        yield _sse("done", {
+            "reply": reply,
+            "model": last.get("model", OLLAMA_MODEL),
+            "ttft_ms": None if ttft is None else round(ttft * 1000, 1),
+            "total_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "eval_count": last.get("eval_count"),
+            "cached": False,
+        })
+
+    def remember_turn():
+        if finished.get("reply"):
+            _remember_turn(user_id, user_text, finished["reply"])
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                             background=BackgroundTask(remember_turn))
+
+
+def _process_frame_batch(payloads, sessions):
+    """Decode frames from many connections and run detection as one batch (video pool)."""
+    frames = [decode_frame(p, target=max(detection.DET_SIZE)) for p in payloads]
+    ok = [i for i, frame in enumerate(frames) if frame is not None]
+    results = [(None, False)] * len(frames)
+    if ok:
+        batch = detection.process_frames([frames[i] for i in ok], [sessions[i] for i in ok])
+        for i, result in zip(ok, batch):
+            results[i] = result
+    return results
+
+
+_frame_scheduler = BatchScheduler(_process_frame_batch)
 
-    return {"reply": llm_reply, "context": context_texts}
 
 @app.websocket("/video-stream")
 async def video_stream(websocket: WebSocket):
     """
-    Frontend sends JPEG base64 (no data URL prefix).
-    We decode -> OpenCV frame (BGR) -> detection.process_frame(frame)
+    Frontend sends raw JPEG bytes as binary messages (or, for older
+    clients, JPEG base64 text with no data URL prefix).
+    Frames are received into a latest-frame-wins slot; the scheduler batches
+    them with other connections' frames and runs decode + detection on the
+    bounded video pool. Each connection has its own presence session.
     Send back: {"user": <name or None>, "active": <bool>}
     """
     await websocket.accept()
     print("[WS] Video stream connected ✅")
+    slot = LatestFrameSlot()
+    session = detection.new_session()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                payload = message.get("bytes") or message.get("text")
+                if payload:
+                    slot.put(payload)
+        finally:
+            slot.close()
+
+    receiver = asyncio.create_task(receive_frames())
     try:
         while True:
-          
-            b64 = await websocket.receive_text()
-            try:
-                img_bytes = base64.b64decode(b64)
-                img_array = np.frombuffer(img_bytes, dtype=np.uint8)
-                frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-                if frame is None:
-                 
-                    await websocket.send_json({"user": None, "active": False})
-                    continue
-            except Exception:
-           
-                await websocket.send_json({"user": None, "active": False})
-                continue
-
-            user, active = detection.process_frame(frame)
-
+            payload = await slot.get()
+            if payload is None:
+                break
+            user, active = await _frame_scheduler.submit(session, payload)
             await websocket.send_json({"user": user, "active": active})
 
+        await receiver  # re-raise how the connection ended
     except WebSocketDisconnect:
-        print("[WS] Client disconnected ❌")
+        print(f"[WS] Client disconnected ❌ (dropped {slot.dropped}/{slot.received} stale frames)")
     except Exception as e:
         print(f"[WS] Error: {e}")
         try:
             await websocket.close()
         except Exception:
             pass
+    finally:
+        receiver.cancel()
+
+
+# Enrollment: embed uploads off the event loop and hot-swap the live gallery.
+async def _enroll(username: str, files: list[UploadFile], replace: bool):
+    images = [await f.read() for f in files]
+    if not images:
+        raise HTTPException(status_code=400, detail="Upload at least one image.")
+    try:
+        return await run_in_pool(detection.enroll_user, username, images, replace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/users")
+async def list_users():
+    return {"users": await run_in_pool(detection.list_users)}
+
+@app.post("/users/{username}")
+async def enroll_user(username: str, files: list[UploadFile] = File(...)):
+    """Enroll a new user, or add more reference images to an existing one."""
+    return await _enroll(username, files, replace=False)
+
+@app.put("/users/{username}")
+async def update_user(username: str, files: list[UploadFile] = File(...)):
+    """Replace all of a user's reference images."""
+    return await _enroll(username, files, replace=True)
+
+@app.delete("/users/{username}")
+async def delete_user(username: str):
+    try:
+        removed = await run_in_pool(detection.delete_user, username)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"Unknown user: {username}")
+    return {"user": username, "deleted": True}
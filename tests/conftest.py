@@ -0,0 +1,38 @@
+import os
+import re
+import sys
+import zlib
+import tempfile
+
+import numpy as np
+import pytest
+
+# Tests import the app modules the way server.py does, from the repo root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read at import time by the modules under test: no Pinecone, no model warmup,
+# nothing written into the working tree.
+os.environ.setdefault("VECTOR_STORE", "local")
+os.environ.setdefault("LOCAL_STORE_DIR", tempfile.mkdtemp(prefix="vector_store-"))
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+os.environ.setdefault("EMBED_CACHE_PATH", "")
+
+
+def bag_of_words(texts) -> np.ndarray:
+    """Stand-in for the sentence model: texts sharing most words get cosine close to 1."""
+    out = []
+    for text in texts:
+        vec = np.zeros(384, dtype=np.float32)
+        for word in re.findall(r"[a-z']+", text.lower()):
+            vec += np.random.default_rng(zlib.crc32(word.encode())).standard_normal(384)
+        out.append(vec / (np.linalg.norm(vec) + 1e-8))
+    return np.stack(out)
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    from modules.rag import embeddings
+
+    monkeypatch.setattr(embeddings, "encode", bag_of_words)
+    monkeypatch.setattr(embeddings.batcher, "_encode", bag_of_words)
+    return bag_of_words
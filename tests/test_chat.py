@@ -0,0 +1,109 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+import rag_utils
+
+
+@pytest.fixture
+def client(fake_embeddings, monkeypatch):
+    calls = []
+
+    async def generate(prompt, model=None, priority="interactive", **fields):
+        calls.append(prompt)
+        return {"response": "Your favourite colour is green.", "context": [1, 2, 3]}
+
+    monkeypatch.setattr(server.llm, "generate", generate)
+    with TestClient(server.app) as c:
+        c.llm_calls = calls
+        yield c
+
+
+def _user_with_facts() -> str:
+    user = f"test-{uuid.uuid4().hex[:8]}"
+    for fact in ["My favourite colour is green", "I live in Paris", "My dog is called Rex",
+                 "I work as a nurse", "I like hiking on weekends"]:
+        rag_utils.upsert_memory(user, fact, wait=True)
+    return user
+
+
+def test_repeated_question_hits_query_cache(client):
+    user = _user_with_facts()
+    for _ in range(2):
+        assert client.post("/chat", json={"text": "What is my favourite colour?", "user": user}).status_code == 200
+
+    hits = rag_utils.query_cache.stats()["hits"]
+    reply = client.post("/chat", json={"text": "What is my favourite colour?", "user": user}).json()
+    assert rag_utils.query_cache.stats()["hits"] == hits + 1
+    assert "My favourite colour is green" in reply["context"]
+
+
+def test_unrelated_write_keeps_cached_result(client):
+    user = _user_with_facts()
+    rag_utils.query_memory("Where do I live?", 3, user)
+    rag_utils.upsert_memory(user, "Quarterly tax filing deadline reminder", wait=True)
+    assert rag_utils.query_cache.get(user, "Where do I live?", 3) is not None
+
+    rag_utils.upsert_memory(user, "I live in Paris near the river", wait=True)
+    assert rag_utils.query_cache.get(user, "Where do I live?", 3) is None
+
+
+@pytest.mark.parametrize("error", ["busy", "llm", "backend"])
+def test_failed_turn_is_not_stored(client, monkeypatch, error):
+    from modules.nlp.llm_client import LLMError
+    from modules.nlp.llm_scheduler import QueueFull
+
+    async def fail(prompt, model=None, priority="interactive", **fields):
+        raise {"busy": QueueFull(7), "llm": LLMError(500), "backend": RuntimeError("down")}[error]
+
+    monkeypatch.setattr(server.llm, "generate", fail)
+    user = f"test-{uuid.uuid4().hex[:8]}"
+    resp = client.post("/chat", json={"text": "Remember that I parked on level 3", "user": user})
+    if error == "busy":
+        assert resp.status_code == 429
+        assert resp.headers["Retry-After"] == "7"
+    else:
+        assert resp.json()["reply"].startswith("⚠️")
+
+    rag_utils.memory_writer.flush()
+    vector = rag_utils.get_embedding("Remember that I parked on level 3")
+    assert rag_utils.get_index().query(vector=vector, top_k=3, namespace=user)["matches"] == []
+
+
+def test_background_priority_reaches_the_llm(client, monkeypatch):
+    calls = []
+
+    async def generate(prompt, model=None, priority="interactive", **fields):
+        calls.append(priority)
+        return {"response": "ok"}
+
+    monkeypatch.setattr(server.llm, "generate", generate)
+    client.post("/chat", json={"text": "Summarise my week", "user": "batch-job", "priority": "background"})
+    assert calls == ["background"]
+    assert client.post("/chat", json={"text": "hi", "priority": "urgent"}).status_code == 422
+
+
+def test_paraphrased_question_hits_response_cache(client, monkeypatch):
+    monkeypatch.setattr(server, "response_cache", server.ResponseCache(enabled=True))
+    user = f"test-{uuid.uuid4().hex[:8]}"
+    for fact in ["My favourite colour is green", "My dog is called Rex",
+                 "My sister lives in Rome", "I work as a nurse"]:
+        rag_utils.upsert_memory(user, fact, wait=True)
+
+    first = client.post("/chat", json={"text": "Can you tell me what my favourite colour is", "user": user}).json()
+    again = client.post("/chat", json={"text": "Can you please tell me what my favourite colour is",
+                                       "user": user}).json()
+    assert "cached" not in first and again["cached"] is True
+    assert len(client.llm_calls) == 1
+
+
+def test_prompt_keeps_plain_top_k_with_cache_off(client):
+    assert not server.response_cache.enabled
+    user = _user_with_facts()
+    client.post("/chat", json={"text": "What is my favourite colour?", "user": user})
+    again = client.post("/chat", json={"text": "What is my favourite colour?", "user": user}).json()
+    # The earlier question and bot reply are the closest memories and stay in the prompt.
+    assert again["context"][0] == "What is my favourite colour?"
+    assert "Your favourite colour is green." in again["context"]
@@ -0,0 +1,21 @@
+import numpy as np
+
+from modules.video.gallery import FaceGallery
+
+
+def test_fingerprint_ignores_row_order():
+    rng = np.random.default_rng(0)
+    embs = {user: rng.standard_normal((3, 32)).astype(np.float32) for user in ["ana", "bo", "cy"]}
+
+    enrolled = FaceGallery(dim=32)               # running server: "cy" enrolled over HTTP last
+    for user in ["ana", "bo", "cy"]:
+        enrolled.add(user, embs[user])
+    restarted = FaceGallery(dim=32)              # after a restart: os.listdir order
+    for user in ["cy", "ana", "bo"]:
+        restarted.add(user, embs[user][::-1])
+
+    assert enrolled.fingerprint() == restarted.fingerprint()
+    assert restarted.attach_index(enrolled.build_index(nlist=2))
+
+    restarted.replace("bo", embs["bo"][:2])
+    assert enrolled.fingerprint() != restarted.fingerprint()
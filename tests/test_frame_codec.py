@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("cv2")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_codec(scale: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "FRAME_DECODE_SCALE": scale}
+    return subprocess.run([sys.executable, "-c", "import modules.video.frame_codec"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+
+
+def test_invalid_decode_scale_fails_at_import():
+    proc = _import_codec("3x")
+    assert proc.returncode != 0
+    assert "FRAME_DECODE_SCALE" in proc.stderr
+
+
+@pytest.mark.parametrize("scale", ["auto", "1", "2", "4", "8"])
+def test_valid_decode_scales_import(scale):
+    assert _import_codec(scale).returncode == 0
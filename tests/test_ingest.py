@@ -0,0 +1,78 @@
+import os
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+from modules.rag import ingest
+from modules.rag.vector_store import LocalStore
+
+
+def _embed(texts):
+    return np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(16) for t in texts])
+
+
+class FlakyStore(LocalStore):
+    """In-memory store whose upserts fail while they contain `poison`."""
+
+    def __init__(self, poison=None):
+        super().__init__(16, path="")
+        self.poison = poison
+        self.calls = 0
+
+    def upsert(self, items, namespace=""):
+        items = list(items)
+        self.calls += 1
+        if self.poison and any(vid == self.poison for vid, *_ in items):
+            raise ConnectionError("upsert failed")
+        super().upsert(items, namespace)
+
+    def ids(self):
+        part = self._parts.get("")
+        return [] if part is None else part.ids[:part.size]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "docs.jsonl"
+    texts = [f"Document {i}. " + ("Some longer sentence to split. " * 40 if i % 7 == 0 else "short")
+             for i in range(60)]                                 # every 7th is several chunks
+    with open(path, "w") as f:
+        for i, text in enumerate(texts):
+            f.write(json.dumps({"id": f"doc{i}", "text": text}) + "\n")
+    expected = [f"doc{i}#{n}" for i, text in enumerate(texts) for n in range(len(ingest.chunk_text(text)))]
+    return str(path), expected
+
+
+def test_failed_batch_resumes_without_gaps(corpus, tmp_path, monkeypatch):
+    path, expected = corpus
+    monkeypatch.setattr(ingest.time, "sleep", lambda s: None)      # no retry backoff
+    ckpt = str(tmp_path / "ckpt.json")
+    store = FlakyStore(poison="doc30#0")
+
+    with pytest.raises(RuntimeError):
+        ingest.ingest([path], store, _embed, ingest.Checkpoint(ckpt), batch_size=4, workers=3,
+                      log=lambda *_: None)
+    written_before = set(store.ids())
+    assert "doc30#0" not in written_before and written_before   # partway through
+    resume_at = ingest.Checkpoint(ckpt).start(path)
+    assert 0 < resume_at < os.path.getsize(path)
+
+    store.poison = None
+    ingest.ingest([path], store, _embed, ingest.Checkpoint(ckpt), batch_size=4, workers=3,
+                  log=lambda *_: None)
+    ids = store.ids()
+    assert sorted(ids) == sorted(expected)                      # all there, once each
+    assert len(ids) == len(set(ids))
+    assert ingest.Checkpoint(ckpt).start(path) == os.path.getsize(path)
+
+
+def test_checkpoint_commits_only_contiguous_batches(tmp_path):
+    ckpt = ingest.Checkpoint(str(tmp_path / "ckpt.json"))
+    ckpt.complete(1, [("a.jsonl", 200)])
+    ckpt.complete(2, [("a.jsonl", 300)])
+    assert ckpt.start("a.jsonl") == 0                            # batch 0 still in flight
+    ckpt.complete(0, [("a.jsonl", 100)])
+    assert ckpt.start("a.jsonl") == 300
+    assert ingest.Checkpoint(str(tmp_path / "ckpt.json")).start("a.jsonl") == 300
@@ -0,0 +1,63 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from modules.nlp.llm_scheduler import LLMScheduler, QueueFull
+
+
+def test_threads_and_coroutines_share_slots():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=4, max_wait=5)
+    held = threading.Event()
+    order = []
+
+    def worker():
+        with scheduler.sync_slot():
+            held.set()
+            time.sleep(0.2)
+            order.append("thread")
+
+    async def chat():
+        await asyncio.to_thread(held.wait)
+        assert scheduler.stats()["active"] == 1
+        async with scheduler.slot():
+            order.append("coroutine")
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    asyncio.run(chat())
+    thread.join()
+    assert order == ["thread", "coroutine"]
+    assert scheduler.stats()["active"] == 0
+
+
+def test_blocking_slot_queues_by_priority_and_times_out():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1, max_wait=0.2)
+    scheduler.acquire_sync()
+    with pytest.raises(QueueFull):
+        scheduler.acquire_sync("background")           # waited max_wait
+    assert scheduler.stats()["timed_out"] == 1
+
+    got = []
+    background = threading.Thread(target=lambda: got.append(_try(scheduler, "background")))
+    background.start()
+    while not scheduler.stats()["queued"]:
+        time.sleep(0.01)
+    scheduler.max_wait = 5
+    interactive = threading.Thread(target=lambda: got.append(_try(scheduler, "interactive")))
+    interactive.start()                                # queue full: pushes the background one out
+    background.join()
+    scheduler.release()
+    interactive.join()
+    assert got == ["QueueFull", "interactive"]
+    assert scheduler.stats()["shed"] == 1
+
+
+def _try(scheduler, priority):
+    try:
+        scheduler.acquire_sync(priority)
+    except QueueFull:
+        return "QueueFull"
+    scheduler.release()
+    return priority
@@ -0,0 +1,29 @@
+import numpy as np
+
+from modules.rag.vector_store import LocalStore
+
+
+def test_two_writers_on_one_directory(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = {vid: rng.standard_normal(16).astype(np.float32) for vid in "xyz"}
+    a = LocalStore(16, path=str(tmp_path), dtype="float32")
+    b = LocalStore(16, path=str(tmp_path), dtype="float32")    # e.g. rag_upsert.py next to the server
+    a.upsert([("x", vectors["x"])])
+    b.upsert([("y", vectors["y"])])
+    a.upsert([("z", vectors["z"])])
+
+    reloaded = LocalStore(16, path=str(tmp_path), dtype="float32")
+    for vid, vec in vectors.items():
+        best = reloaded.query(vec, top_k=1)["matches"][0]
+        assert best["id"] == vid and best["score"] > 0.999
+
+
+def test_torn_tail_is_dropped_on_reload(tmp_path):
+    store = LocalStore(8, path=str(tmp_path), dtype="int8")
+    store.upsert([("a", np.ones(8))])
+    with open(store._vectors_path(), "ab") as f:
+        f.write(b"\x01\x02\x03")                       # crash mid-row
+    reloaded = LocalStore(8, path=str(tmp_path))
+    reloaded.upsert([("b", -np.ones(8))])
+    again = LocalStore(8, path=str(tmp_path))
+    assert [m["id"] for m in again.query(-np.ones(8), top_k=2)["matches"]] == ["b", "a"]
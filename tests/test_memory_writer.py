@@ -0,0 +1,38 @@
+import numpy as np
+
+from modules.rag.memory_writer import MemoryWriter
+
+
+def _entry(i):
+    return {"id": f"m{i}", "user_id": "u", "namespace": "u", "text": f"memory {i}", "metadata": {}}
+
+
+def _writer(written):
+    return MemoryWriter(lambda texts: np.zeros((len(texts), 4), dtype=np.float32),
+                        lambda items, namespace="": written.extend(i[0] for i in items),
+                        flush_ms=10_000)
+
+
+def test_close_drains_and_later_writes_are_synchronous():
+    written = []
+    writer = _writer(written)
+    writer.enqueue(_entry(0))
+    writer.close()
+    assert written == ["m0"]
+
+    writer.enqueue(_entry(1))                  # no worker: written before returning
+    assert written == ["m0", "m1"]
+    writer.flush()                             # returns instead of waiting forever
+    assert writer.stats()["queued"] == 0 and not writer.stats()["running"]
+
+
+def test_restart_after_close():
+    written = []
+    writer = _writer(written)
+    writer.close()
+    writer.start()
+    writer.enqueue(_entry(2))
+    assert written == [] and writer.pending()  # queued again, flushed on demand
+    writer.flush(timeout=5)
+    assert written == ["m2"]
+    writer.close()
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+
+from modules.rag.onnx_embedder import EMBED_ONNX_DIR, PARITY_TEXTS
+
+MODEL_NAME = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+GRAPHS = [("model.onnx", 0.9999), ("model_int8.onnx", 0.99)]
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """SentenceTransformer output for PARITY_TEXTS (one padded batch, incl. an over-length text)."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    st = pytest.importorskip("sentence_transformers")
+    if not os.path.exists(os.path.join(EMBED_ONNX_DIR, "tokenizer.json")):
+        pytest.skip(f"no exported model in {EMBED_ONNX_DIR} (python -m modules.rag.onnx_embedder export)")
+    return st.SentenceTransformer(MODEL_NAME).encode(PARITY_TEXTS, normalize_embeddings=True)
+
+
+@pytest.mark.parametrize("model_file, min_cosine", GRAPHS)
+def test_matches_sentence_transformer(reference, model_file, min_cosine):
+    from modules.rag.onnx_embedder import OnnxEmbedder
+
+    if not os.path.exists(os.path.join(EMBED_ONNX_DIR, model_file)):
+        pytest.skip(f"{model_file} not exported")
+    embedder = OnnxEmbedder(EMBED_ONNX_DIR, model_file)
+    batch = embedder.encode(PARITY_TEXTS)
+    assert batch.shape == reference.shape
+    assert np.sum(batch * reference, axis=1).min() >= min_cosine
+
+    # Padding must not leak into the pooling: each text alone gives the same vector.
+    alone = np.vstack([embedder.encode([t]) for t in PARITY_TEXTS])
+    assert np.sum(batch * alone, axis=1).min() >= 0.9999
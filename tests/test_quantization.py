@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from modules.rag import quantization
+from modules.rag.vector_store import LocalStore
+
+DIM = 384
+
+
+def _unit(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    """Clustered unit vectors, closer to sentence embeddings than isotropic noise."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((40, DIM))
+    vectors = _unit(centers[rng.integers(0, 40, 3000)] + 0.8 * rng.standard_normal((3000, DIM)))
+    queries = _unit(vectors[rng.choice(3000, 100, replace=False)] + 0.5 * rng.standard_normal((100, DIM)) / np.sqrt(DIM))
+    return vectors.astype(np.float32), queries.astype(np.float32)
+
+
+def _recall_at_10(store, vectors, queries):
+    hits = 0
+    for q in queries:
+        exact = set(np.argsort(-(vectors @ q))[:10].tolist())
+        found = {int(m["id"]) for m in store.query(q, top_k=10, include_metadata=False)["matches"]}
+        hits += len(exact & found)
+    return hits / (10 * len(queries))
+
+
+@pytest.mark.parametrize("dtype, min_recall", [("float32", 1.0), ("float16", 0.99), ("int8", 0.95)])
+def test_recall_at_10_against_float32(corpus, dtype, min_recall):
+    vectors, queries = corpus
+    store = LocalStore(DIM, path="", dtype=dtype)
+    store.upsert((str(i), v) for i, v in enumerate(vectors))
+    assert _recall_at_10(store, vectors, queries) >= min_recall
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_dequantize_roundtrip(corpus, dtype):
+    vectors, _ = corpus
+    restored = quantization.dequantize(quantization.quantize(vectors[:50], dtype))
+    assert np.allclose(restored, vectors[:50], atol=2e-3 if dtype == "float16" else 1e-2)